@@ -0,0 +1,68 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+from api.metrics import metrics
+
+
+class ResponseCache:
+    '''
+    Кэш данных ответов в общем кэше Django.
+    Ключ строится из версии данных и нормализованных параметров запроса,
+    поэтому при смене версии старые записи перестают читаться.
+    Попадания и промахи учитываются в показателях процесса,
+    чтобы чтение из кэша не требовало записи в общий кэш.
+    '''
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+
+    @property
+    def cache(self):
+        return caches[settings.SHARED_CACHE_ALIAS]
+
+    def make_key(self, request, version):
+        '''
+        Возвращает ключ ответа по учитываемым параметрам запроса,
+        отсортированным по имени и значению.
+        '''
+        query = urlencode(
+            [
+                (param, value)
+                for param in sorted(self.params)
+                for value in sorted(request.query_params.getlist(param))
+            ]
+        )
+        digest = hashlib.md5(
+            f'{request.get_host()}?{query}'.encode()
+        ).hexdigest()
+        return f'response:{self.name}:{version}:{digest}'
+
+    def get(self, key):
+        data = self.cache.get(key)
+        metrics.record_response_cache(
+            self.name, 'hit' if data is not None else 'miss'
+        )
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+
+
+recipe_feed_cache = ResponseCache(
+    'recipe_feed',
+    (
+        'page',
+        'limit',
+        'tags',
+        'tags_match',
+        'author',
+        'search',
+        'ordering',
+        'pagination',
+        'cursor',
+    ),
+)
@@ -0,0 +1,198 @@
+import base64
+import binascii
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+from api.utilities import get_duplicates
+
+BASE64_HEADER = ';base64,'
+BASE64_CHUNK_SIZE = 64 * 1024
+# Pillow определяет JPEG камер телефонов с несколькими кадрами как MPO.
+IMAGE_FORMAT_ALIASES = {'MPO': 'JPEG'}
+
+
+class PrimaryKeyListField(serializers.ManyRelatedField):
+    '''
+    Поле списка первичных ключей.
+    Получает все объекты одним запросом и сообщает
+    обо всех несуществующих и повторяющихся ключах сразу.
+    '''
+
+    default_error_messages = {
+        'incorrect_type': 'Ожидался список целых чисел.',
+        'does_not_exist': 'Недопустимые идентификаторы: {pk_values}.',
+        'duplicates': 'Повторяющиеся идентификаторы: {pk_values}.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(
+            child_relation=serializers.PrimaryKeyRelatedField(
+                queryset=queryset
+            ),
+            **kwargs,
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        try:
+            pks = [int(pk) for pk in data]
+        except (TypeError, ValueError):
+            self.fail('incorrect_type')
+
+        objects = self.child_relation.get_queryset().in_bulk(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        duplicates = get_duplicates(pks)
+        errors = []
+        if missing:
+            errors.append(
+                self.error_messages['does_not_exist'].format(
+                    pk_values=', '.join(map(str, missing))
+                )
+            )
+        if duplicates:
+            errors.append(
+                self.error_messages['duplicates'].format(
+                    pk_values=', '.join(map(str, duplicates))
+                )
+            )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [objects[pk] for pk in pks]
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    '''
+    Поле ссылок на уменьшенные копии картинки рецепта.
+    Если variant задан, отдает ссылку на копию этого размера в JPEG,
+    а пока копии не готовы - на исходную картинку.
+    '''
+
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def get_url(self, url):
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, recipe):
+        variants = recipe.image_variants
+        if self.variant is None:
+            return {
+                name: {
+                    ext: self.get_url(default_storage.url(path))
+                    for ext, path in paths.items()
+                }
+                for name, paths in variants.items()
+            }
+        if self.variant in variants:
+            return self.get_url(
+                default_storage.url(variants[self.variant]['jpg'])
+            )
+        if not recipe.image:
+            return None
+        return self.get_url(recipe.image.url)
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    '''
+    Поле картинки, закодированной в Base64.
+    Отклоняет картинку по размеру до декодирования, декодирует ее
+    частями во временный файл и проверяет формат и разрешение
+    по заголовку файла, не декодируя пиксели.
+    '''
+
+    default_error_messages = {
+        'invalid_type': 'Ожидалась картинка, закодированная в Base64.',
+        'invalid_image': 'Загрузите корректную картинку.',
+        'too_large': 'Размер картинки не должен превышать {max_size} байт.',
+        'too_big_dimensions': (
+            'Разрешение картинки не должно превышать {width}x{height}.'
+        ),
+    }
+
+    def get_decoded_size(self, data, start):
+        '''
+        Возвращает размер декодированных данных без их декодирования.
+        '''
+        length = len(data) - start
+        if length == 0 or length % 4:
+            self.fail('invalid_image')
+        return length // 4 * 3 - data.count('=', len(data) - 2)
+
+    def decode(self, data, start, size):
+        '''
+        Декодирует данные частями во временный файл.
+        '''
+        file = UploadedFile(
+            file=tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR),
+            name='image',
+            size=size,
+        )
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                file.write(
+                    base64.b64decode(
+                        data[offset:offset + BASE64_CHUNK_SIZE],
+                        validate=True,
+                    )
+                )
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        return file
+
+    def check_image(self, file):
+        '''
+        Проверяет формат и разрешение картинки по заголовку файла.
+        '''
+        try:
+            with Image.open(file) as image:
+                image_format = IMAGE_FORMAT_ALIASES.get(
+                    image.format, image.format
+                )
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            file.close()
+            self.fail('invalid_image')
+        max_width, max_height = settings.RECIPE_IMAGE_MAX_DIMENSIONS
+        if width > max_width or height > max_height:
+            file.close()
+            self.fail(
+                'too_big_dimensions', width=max_width, height=max_height
+            )
+        extension = image_format.lower()
+        if extension not in self.ALLOWED_TYPES:
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        file.name = f'{uuid.uuid4()}.{extension}'
+        file.content_type = Image.MIME[image_format]
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(data, str):
+            self.fail('invalid_type')
+        start = data.find(BASE64_HEADER)
+        start = 0 if start == -1 else start + len(BASE64_HEADER)
+        size = self.get_decoded_size(data, start)
+        if size > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        file = self.decode(data, start, size)
+        self.check_image(file)
+        return serializers.FileField.to_internal_value(self, file)
@@ -1,7 +1,17 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from recipes.catalogue import tag_catalogue
+from recipes.models import SEARCH_CONFIG, Recipe
+
+
+def tag_choices():
+    '''
+    Возвращает варианты слагов тегов из кэша справочника.
+    '''
+    return [(slug, slug) for slug in tag_catalogue.by_field('slug')]
 
 
 class RecipeFilter(FilterSet):
@@ -9,20 +19,49 @@ class RecipeFilter(FilterSet):
     Фильтр для модели Recipe.
     '''
 
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices, method='filter_tags'
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='filter_tags_match',
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Популярные'), ('trending', 'В тренде')),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author')
 
+    def filter_tags(self, queryset, name, value):
+        '''
+        Фильтрует рецепты по тегам подзапросами EXISTS к таблице
+        связей рецептов и тегов, не размножая строки рецептов.
+        При tags_match=all рецепт должен иметь все теги,
+        иначе хотя бы один.
+        '''
+        by_slug = tag_catalogue.by_field('slug')
+        tag_ids = {by_slug[slug].pk for slug in value}
+        recipe_tags = Recipe.tags.through.objects.filter(recipe=OuterRef('pk'))
+        if self.form.cleaned_data.get('tags_match') == 'all':
+            return queryset.filter(
+                *(Exists(recipe_tags.filter(tag=tag_id)) for tag_id in tag_ids)
+            )
+        return queryset.filter(Exists(recipe_tags.filter(tag__in=tag_ids)))
+
+    def filter_tags_match(self, queryset, name, value):
+        '''
+        Режим фильтрации по тегам применяется в filter_tags.
+        '''
+        return queryset
+
     def filter_is_favorited(self, queryset, name, value):
         '''
         Фильтрует рецепты по наличию в избранном пользователя.
@@ -41,10 +80,32 @@ class RecipeFilter(FilterSet):
             return queryset.filter(is_in_shopping_cart__user=user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        '''
+        Полнотекстовый поиск по названию и описанию рецепта
+        с нечетким совпадением названия для опечаток.
+        Результаты упорядочены по релевантности.
+        '''
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return (
+            queryset.filter(
+                Q(search_vector=query) | Q(name__trigram_similar=value)
+            )
+            .annotate(
+                search_rank=SearchRank(F('search_vector'), query),
+                name_similarity=TrigramSimilarity('name', value),
+            )
+            .order_by('-search_rank', '-name_similarity', '-create_date')
+        )
 
-class CustomSearchFilter(SearchFilter):
-    '''
-    Кастомный фильтр поиска с переопределенным параметром поиска на name.
-    '''
-
-    search_param = 'name'
+    def filter_ordering(self, queryset, name, value):
+        '''
+        Упорядочивает рецепты по предварительно рассчитанному рейтингу
+        популярности или тренда по индексу таблицы рейтингов.
+        Рецепты без рейтинга в выдачу не попадают до его создания.
+        '''
+        return queryset.filter(score__isnull=False).order_by(
+            f'-score__{value}', '-id'
+        )
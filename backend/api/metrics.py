@@ -0,0 +1,210 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+HISTOGRAMS = {
+    'request_duration_seconds': (
+        'Время обработки запроса.', TIME_BUCKETS
+    ),
+    'db_duration_seconds': ('Время SQL запросов запроса.', TIME_BUCKETS),
+    'serializer_duration_seconds': (
+        'Время сериализации ответа.', TIME_BUCKETS
+    ),
+    'db_queries': ('Количество SQL запросов запроса.', QUERY_BUCKETS),
+    'response_size_bytes': ('Размер ответа.', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'duplicate_queries_total': (
+        'Повторные SQL запросы с одинаковым текстом в рамках одного запроса.'
+    ),
+    'slow_requests_total': 'Медленные запросы.',
+}
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+class RequestStats:
+    '''
+    Показатели одного запроса к API.
+    '''
+
+    def __init__(self):
+        self.queries = []
+        self.serializer_time = 0
+        self.serializer_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        '''
+        Обертка выполнения SQL запросов для connection.execute_wrapper.
+        '''
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, params, time.perf_counter() - started)
+            )
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    @property
+    def duplicate_queries(self):
+        return len(self.queries) - len({sql for sql, _, _ in self.queries})
+
+
+@contextmanager
+def serializer_timer():
+    '''
+    Добавляет время выполнения блока ко времени сериализации
+    текущего запроса, не учитывая вложенные сериализаторы повторно.
+    '''
+    stats = current_stats.get()
+    if stats is None:
+        yield
+        return
+    stats.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        if not stats.serializer_depth:
+            stats.serializer_time += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    '''
+    Учитывает время to_representation сериализатора
+    в показателях текущего запроса.
+    '''
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+class Histogram:
+    '''
+    Гистограмма с накопительными корзинами в формате Prometheus.
+    '''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield str(bound), cumulative
+
+
+class MetricsRegistry:
+    '''
+    Агрегированные показатели запросов по представлениям DRF.
+    Хранится в памяти процесса, поэтому каждый процесс
+    сервера приложений отдает собственные показатели.
+    '''
+
+    prefix = 'foodgram_'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = Counter()
+        self.response_cache = Counter()
+
+    def record(self, view, stats, duration, size, slow):
+        '''
+        Добавляет показатели запроса к представлению view.
+        '''
+        values = {
+            'request_duration_seconds': duration,
+            'db_duration_seconds': stats.db_time,
+            'serializer_duration_seconds': stats.serializer_time,
+            'db_queries': len(stats.queries),
+        }
+        if size is not None:
+            values['response_size_bytes'] = size
+        with self.lock:
+            for name, value in values.items():
+                key = (name, view)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+                self.histograms[key].observe(value)
+            self.counters['duplicate_queries_total', view] += (
+                stats.duplicate_queries
+            )
+            self.counters['slow_requests_total', view] += int(slow)
+
+    def record_response_cache(self, cache, result):
+        '''
+        Учитывает обращение к кэшу ответов cache с результатом result.
+        '''
+        with self.lock:
+            self.response_cache[cache, result] += 1
+
+    def render(self):
+        '''
+        Возвращает показатели в текстовом формате Prometheus.
+        '''
+        lines = []
+        with self.lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                metric = f'{self.prefix}{name}'
+                lines += [
+                    f'# HELP {metric} {help_text}',
+                    f'# TYPE {metric} histogram',
+                ]
+                for (key, view), histogram in sorted(self.histograms.items()):
+                    if key != name:
+                        continue
+                    for bound, count in histogram.samples():
+                        lines.append(
+                            f'{metric}_bucket{{view="{view}",le="{bound}"}} '
+                            f'{count}'
+                        )
+                    lines += [
+                        f'{metric}_sum{{view="{view}"}} {histogram.sum}',
+                        f'{metric}_count{{view="{view}"}} {histogram.count}',
+                    ]
+            for name, help_text in COUNTERS.items():
+                metric = f'{self.prefix}{name}'
+                lines += [
+                    f'# HELP {metric} {help_text}',
+                    f'# TYPE {metric} counter',
+                ]
+                for (key, view), value in sorted(self.counters.items()):
+                    if key == name:
+                        lines.append(f'{metric}{{view="{view}"}} {value}')
+            metric = f'{self.prefix}response_cache_requests_total'
+            lines += [
+                f'# HELP {metric} Обращения к кэшу ответов.',
+                f'# TYPE {metric} counter',
+            ]
+            for (cache, result), value in sorted(
+                self.response_cache.items()
+            ):
+                lines.append(
+                    f'{metric}{{cache="{cache}",result="{result}"}} {value}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
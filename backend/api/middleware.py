@@ -0,0 +1,94 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from api.metrics import RequestStats, current_stats, metrics
+
+logger = logging.getLogger('foodgram.performance')
+
+
+def get_view_name(request):
+    '''
+    Возвращает имя представления запроса вида ViewSet.action.
+    '''
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or 'unknown'
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class PerformanceMiddleware:
+    '''
+    Собирает показатели запросов: время обработки, время и количество
+    SQL запросов, повторяющиеся запросы, время сериализации и размер
+    ответа. Медленные запросы логируются вместе с текстом их SQL
+    без параметров, чтобы в лог не попадали токены и личные данные.
+    Для потоковых ответов показатели собираются по окончании передачи.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats.record_query):
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, response.streaming_content, stats, started
+            )
+        else:
+            self.finish(
+                request, response, stats, started, len(response.content)
+            )
+        return response
+
+    def stream(self, request, response, content, stats, started):
+        '''
+        Передает содержимое потокового ответа, учитывая его размер
+        и выполненные при его формировании SQL запросы.
+        '''
+        size = 0
+        try:
+            with connection.execute_wrapper(stats.record_query):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self.finish(request, response, stats, started, size)
+
+    def finish(self, request, response, stats, started, size):
+        duration = time.perf_counter() - started
+        view = get_view_name(request)
+        slow = duration >= settings.SLOW_REQUEST_THRESHOLD
+        metrics.record(view, stats, duration, size, slow)
+        if slow:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.3f с, SQL: %d запросов '
+                'за %.3f с, сериализация: %.3f с, статус %s.\n%s',
+                request.method,
+                request.get_full_path(),
+                view,
+                duration,
+                len(stats.queries),
+                stats.db_time,
+                stats.serializer_time,
+                response.status_code,
+                '\n'.join(
+                    f'{query_time * 1000:.1f} мс: {sql}'
+                    for sql, _, query_time in stats.queries
+                ),
+            )
@@ -1,7 +1,119 @@
-from rest_framework import mixins, viewsets
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    '''
+    Поддержка условных GET-запросов для list и retrieve.
+    ETag строится из версий данных без обращения к сериализатору,
+    при совпадении с If-None-Match возвращается 304 Not Modified.
+    ETag сравниваются без учета слабой метки W/, которую добавляют
+    сжимающие ответ прокси.
+    '''
+
+    def get_etag(self, request):
+        '''
+        Возвращает версию ответа или None, если ETag не нужен.
+        '''
+        return None
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        version = self.get_etag(request)
+        if version is None:
+            return handler(request, *args, **kwargs)
+        etag = quote_etag(str(version))
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in etags or etag in {tag.removeprefix('W/') for tag in etags}:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class AnonymousListCacheMixin:
+    '''
+    Кэширование ответов list для неавторизованных пользователей.
+    Версией кэша служит get_etag(), ответ помечается заголовком X-Cache.
+    '''
+
+    list_cache = None
+
+    def list(self, request, *args, **kwargs):
+        if self.list_cache is None or request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        key = self.list_cache.make_key(request, self.get_etag(request))
+        data = self.list_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.list_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
 
 
 class ListRetrieveViewSet(
     mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
 ):
     '''ViewSet GET'''
+
+
+class CatalogueMixin:
+    '''
+    Чтение списка и объектов справочника из кэша catalogue.
+    '''
+
+    catalogue = None
+
+    def get_catalogue_items(self):
+        return self.catalogue.all()
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            self.get_catalogue_items(), many=True
+        )
+        return Response(serializer.data)
+
+    def get_object(self):
+        try:
+            pk = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+        obj = self.catalogue.by_id().get(pk)
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class CatalogueViewSet(
+    ConditionalGetMixin, CatalogueMixin, ListRetrieveViewSet
+):
+    '''
+    ViewSet GET для справочника, читающий данные из кэша catalogue.
+    ETag ответа равен версии справочника.
+    '''
+
+    def get_etag(self, request):
+        return self.catalogue.version()
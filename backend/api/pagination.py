@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -9,3 +17,158 @@ class CustomPageNumberPagination(PageNumberPagination):
     '''
 
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''
+    Курсорная пагинация рецептов по дате публикации и id.
+    '''
+
+    page_size_query_param = 'limit'
+    ordering = ('-create_date', '-id')
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    '''
+    Курсорная пагинация подписок по id автора.
+    '''
+
+    page_size_query_param = 'limit'
+    ordering = ('-id',)
+
+
+class CursorOrPageNumberPagination(BasePagination):
+    '''
+    Пагинация по номеру страницы с переключением на курсорную
+    по параметру pagination=cursor или при наличии параметра cursor.
+    Курсорная пагинация не выполняет COUNT(*) и OFFSET.
+    '''
+
+    page_number_class = PageNumberPagination
+    cursor_class = RecipeCursorPagination
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.paginator = None
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.paginator = self.cursor_class()
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
+
+
+class RecipePagination(CursorOrPageNumberPagination):
+    '''
+    Пагинация ленты рецептов.
+    Результаты поиска (параметр search) и ленты по рейтингу
+    (параметр ordering) упорядочены не по дате, поэтому всегда
+    используют пагинацию по номеру страницы.
+    '''
+
+    ordered_query_params = ('search', 'ordering')
+
+    def use_cursor(self, request):
+        if any(
+            param in request.query_params
+            for param in self.ordered_query_params
+        ):
+            return False
+        return super().use_cursor(request)
+
+
+class SubscriptionPagination(CursorOrPageNumberPagination):
+    '''
+    Пагинация списка подписок.
+    '''
+
+    page_number_class = CustomPageNumberPagination
+    cursor_class = SubscriptionCursorPagination
+
+
+class FeedCursorPagination(BasePagination):
+    '''
+    Курсорная пагинация ленты подписок по паре
+    (дата публикации, id рецепта) последнего рецепта страницы.
+    Страница выбирается функцией fetch(limit, position),
+    возвращающей пары по убыванию.
+    '''
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        if page_size <= 0:
+            return api_settings.PAGE_SIZE
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            date, recipe_id = (
+                b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            )
+            return datetime.fromisoformat(date), int(recipe_id)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        date, recipe_id = position
+        encoded = b64encode(
+            f'{date.isoformat()}|{recipe_id}'.encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded,
+        )
+
+    def paginate_entries(self, fetch, request):
+        '''
+        Возвращает id рецептов страницы.
+        '''
+        self.request = request
+        page_size = self.get_page_size(request)
+        entries = fetch(page_size + 1, self.decode_cursor(request))
+        self.next_position = (
+            entries[page_size - 1] if len(entries) > page_size else None
+        )
+        return [recipe_id for _, recipe_id in entries[:page_size]]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                'next': self.get_next_link(),
+                'previous': None,
+                'results': data,
+            }
+        )
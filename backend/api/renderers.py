@@ -0,0 +1,91 @@
+import csv
+
+from rest_framework.renderers import BaseRenderer
+
+
+class Echo:
+    '''
+    Псевдобуфер, возвращающий записанную строку вместо её хранения.
+    '''
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    '''
+    Базовый рендерер списка покупок.
+    Формирует файл построчно, не накапливая его содержимое в памяти.
+    '''
+
+    charset = 'utf-8'
+    filename = 'shopping_list'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        '''
+        Рендерит ответы с ошибками, содержимое списка покупок
+        передается через stream().
+        '''
+        if data is None:
+            return b''
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode(self.charset)
+
+    def get_filename(self):
+        return f'{self.filename}.{self.format}'
+
+    def stream(self, ingredients):
+        '''
+        Генерирует строки файла по кортежам
+        (название, количество, единица измерения).
+        '''
+        raise NotImplementedError(
+            'Метод stream() должен быть переопределен.'
+        )
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    '''
+    Рендерер списка покупок в TXT.
+    '''
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield 'Список покупок:\n'
+        for i, (name, amount, unit) in enumerate(ingredients, start=1):
+            yield f'{i}. {name} - {amount} {unit}\n'
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    '''
+    Рендерер списка покупок в CSV.
+    '''
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        )
+        for row in ingredients:
+            yield writer.writerow(row)
+
+
+class PrometheusRenderer(BaseRenderer):
+    '''
+    Рендерер показателей в текстовом формате Prometheus.
+    '''
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', '')
+        return str(data).encode(self.charset)
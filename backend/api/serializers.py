@@ -1,16 +1,26 @@
+import zlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
-from api.utilities import is_item_linked_to_user
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from api.fields import (ImageVariantsField, PrimaryKeyListField,
+                        StreamingBase64ImageField)
+from api.metrics import TimedSerializerMixin
+from api.utilities import get_annotated_flag, get_duplicates, get_recipes_limit
+from recipes.catalogue import ingredient_catalogue, tag_catalogue
+from recipes.models import (Favorite, ImageJob, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, ShoppingListItem, Tag,
+                            ingredients_prefetch)
 from users.models import Subscription
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''Сериализатор для модели User.'''
 
     is_subscribed = serializers.SerializerMethodField()
@@ -27,10 +37,12 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return is_item_linked_to_user(self, obj, Subscription, 'subscribing')
+        return get_annotated_flag(
+            self, obj, 'is_subscribed', Subscription, 'subscribing'
+        )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''Сериализатор для модели Tag.'''
 
     class Meta:
@@ -38,7 +50,25 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class TagListField(PrimaryKeyListField):
+    '''
+    Поле тегов рецепта.
+    Принимает список id тегов, а отдает данные тегов
+    из кэша справочника по аннотации tag_ids.
+    '''
+
+    def get_attribute(self, instance):
+        tag_ids = getattr(instance, 'tag_ids', None)
+        if tag_ids is None:
+            return list(instance.tags.all())
+        tags_by_id = tag_catalogue.by_id()
+        return [tags_by_id[pk] for pk in tag_ids if pk in tags_by_id]
+
+    def to_representation(self, tags):
+        return TagSerializer(tags, many=True).data
+
+
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''Сериализатор для модели Ingredient.'''
 
     class Meta:
@@ -60,19 +90,67 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    '''
+    Сериализатор списка рецептов.
+    Берет не зависящую от пользователя часть представления рецептов
+    из кэша по версии рецепта и справочников, подгружая ингредиенты
+    только для отсутствующих в кэше рецептов, и накладывает на нее
+    поля текущего пользователя из аннотаций queryset.
+    '''
+
+    def get_fragment_key(self, recipe, versions):
+        request = self.context.get('request')
+        base_url = request.build_absolute_uri('/') if request else ''
+        return (
+            f'recipe_fragment:{self.child.get_fragment_schema()}:'
+            f'{recipe.pk}:{recipe.update_date.timestamp()}:{versions}:'
+            f'{base_url}'
+        )
+
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        cache = caches[settings.SHARED_CACHE_ALIAS]
+        versions = (
+            f'{tag_catalogue.version()}:{ingredient_catalogue.version()}'
+        )
+        keys = {
+            recipe.pk: self.get_fragment_key(recipe, versions)
+            for recipe in recipes
+        }
+        fragments = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            prefetch_related_objects(missing, ingredients_prefetch())
+            fresh = {
+                keys[recipe.pk]: self.child.to_fragment(recipe)
+                for recipe in missing
+            }
+            cache.set_many(fresh, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+            fragments.update(fresh)
+        return [
+            self.child.overlay(fragments[keys[recipe.pk]], recipe)
+            for recipe in recipes
+        ]
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''Сериализатор рецепта.'''
 
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = TagListField(queryset=Tag.objects.all())
     author = UserSerializer(read_only=True)
     ingredients = IngredientInRecipeSerializer(
         many=True, required=True, source='recipe_ingredients'
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -85,20 +163,51 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeListSerializer
 
-    def to_representation(self, instance):
+    per_user_fields = ('author', 'is_favorited', 'is_in_shopping_cart')
+    # Увеличивается при изменении представления полей без изменения
+    # их списка, чтобы не читать из кэша фрагменты старого формата.
+    fragment_version = 1
+
+    @classmethod
+    def get_fragment_schema(cls):
+        '''
+        Возвращает версию формата фрагмента кэша по списку полей
+        и fragment_version.
         '''
-        Переопределение вывода и конвертация id
-        тегов в сериализованные данные
+        fields = ','.join(cls.Meta.fields).encode()
+        return f'{cls.fragment_version}-{zlib.crc32(fields):x}'
+
+    def to_fragment(self, instance):
         '''
-        rep = super().to_representation(instance)
-        tag_ids = instance.tags.all().values_list('id', flat=True)
-        tags = Tag.objects.filter(id__in=tag_ids)
-        serializer = TagSerializer(tags, many=True)
-        rep['tags'] = serializer.data
+        Возвращает представление рецепта без полей,
+        зависящих от текущего пользователя.
+        '''
+        return {
+            name: value
+            for name, value in self.to_representation(instance).items()
+            if name not in self.per_user_fields
+        }
+
+    def overlay(self, fragment, instance):
+        '''
+        Дополняет представление рецепта без пользовательских полей
+        полями текущего пользователя.
+        '''
+        rep = {}
+        for name in self.Meta.fields:
+            if name in self.per_user_fields:
+                field = self.fields[name]
+                rep[name] = field.to_representation(
+                    field.get_attribute(instance)
+                )
+            else:
+                rep[name] = fragment[name]
         return rep
 
     def get_is_favorited(self, obj):
@@ -106,121 +215,156 @@ class RecipeSerializer(serializers.ModelSerializer):
         Получение информации о том, добавлен ли рецепт
         в избранное у текущего пользователя.
         '''
-        return is_item_linked_to_user(self, obj, Favorite, 'recipe')
+        return get_annotated_flag(self, obj, 'favorited', Favorite, 'recipe')
 
     def get_is_in_shopping_cart(self, obj):
         '''
         Получение информации о том, добавлен ли рецепт
         в корзину покупок текущего пользователя.
         '''
-        return is_item_linked_to_user(self, obj, ShoppingCart, 'recipe')
+        return get_annotated_flag(
+            self, obj, 'in_shopping_cart', ShoppingCart, 'recipe'
+        )
 
     def validate_tags(self, tags):
         '''
         Пользовательский валидатор для поля 'tags'.
-        Проверяет, что предоставленные идентификаторы тегов существуют.
+        Существование тегов проверяет поле PrimaryKeyListField.
         '''
         if not tags:
             raise serializers.ValidationError(
                 'Количество тегов должно быть 1 и более.'
             )
-        for tag in tags:
-            try:
-                Tag.objects.get(id=tag.id)
-            except Tag.DoesNotExist:
-                raise serializers.ValidationError(
-                    'Недопустимый идентификатор тега: {}'.format(tag.id)
-                )
         return tags
 
     def validate_ingredients(self, ingredients):
         '''
         Пользовательский валидатор для поля 'ingredients'.
+        Получает все ингредиенты одним запросом, сообщает обо всех
+        ошибках сразу и заменяет id ингредиентов на объекты.
         '''
-        # unique_id = set([ingredient.get('ingredient').get('id')
-        #                 for ingredient in ingredients])
-        # print(f'уникальный список {unique_id}')
-
         if not ingredients:
             raise serializers.ValidationError(
                 'Количество ингредиентов должно быть 1 и более.'
             )
-        for ingredient in ingredients:
-            try:
-                ingredient_id = ingredient.get('ingredient').get('id')
-                Ingredient.objects.get(id=ingredient_id)
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    'Недопустимый идентификатор ингредиента: '
-                    '{}'.format(ingredient_id)
-                )
-            amount = ingredient.get('amount')
-            if amount <= 0:
-                raise serializers.ValidationError(
-                    'Недопустимое значение количества: ' '{}'.format(amount)
-                )
+        ids = [item['ingredient']['id'] for item in ingredients]
+        resolved = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in dict.fromkeys(ids) if pk not in resolved]
+        duplicates = get_duplicates(ids)
+        amounts = [
+            item['amount'] for item in ingredients if item['amount'] <= 0
+        ]
+        errors = []
+        if missing:
+            errors.append(
+                'Недопустимые идентификаторы ингредиентов: '
+                '{}.'.format(', '.join(map(str, missing)))
+            )
+        if duplicates:
+            errors.append(
+                'Повторяющиеся ингредиенты: '
+                '{}.'.format(', '.join(map(str, duplicates)))
+            )
+        if amounts:
+            errors.append(
+                'Недопустимые значения количества: '
+                '{}.'.format(', '.join(map(str, amounts)))
+            )
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        for item in ingredients:
+            item['ingredient'] = resolved[item['ingredient']['id']]
         return ingredients
 
+    def save_ingredients(self, recipe, ingredients_data):
+        '''
+        Сохраняет ингредиенты рецепта пакетными запросами,
+        изменяя только отличающиеся строки.
+        Ожидает ингредиенты, полученные в validate_ingredients.
+        Возвращает id добавленных и измененных ингредиентов: пакетные
+        запросы не отправляют сигналы, пересчитывающие списки покупок.
+        '''
+        ingredients = {
+            item['ingredient'].id: item['ingredient']
+            for item in ingredients_data
+        }
+        amounts = {
+            item['ingredient'].id: item['amount'] for item in ingredients_data
+        }
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.all()
+        }
+        to_create = [
+            IngredientInRecipe(
+                recipe=recipe, ingredient=ingredients[pk], amount=amount
+            )
+            for pk, amount in amounts.items()
+            if pk not in current
+        ]
+        to_update = []
+        to_delete = []
+        for pk, item in current.items():
+            if pk not in amounts:
+                to_delete.append(item.pk)
+            elif item.amount != amounts[pk]:
+                item.amount = amounts[pk]
+                to_update.append(item)
+
+        if to_delete:
+            IngredientInRecipe.objects.filter(pk__in=to_delete).delete()
+        IngredientInRecipe.objects.bulk_update(to_update, ('amount',))
+        IngredientInRecipe.objects.bulk_create(to_create)
+        return {item.ingredient_id for item in to_create + to_update}
+
+    @transaction.atomic
     def create(self, validated_data):
         '''
         Создание нового рецепта.
         '''
-        tags_data = validated_data.pop('tags')
+        tags = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipe_ingredients')
         recipe = Recipe.objects.create(**validated_data)
-
-        for ingredient_data in ingredients_data:
-            ingredient = Ingredient.objects.get(
-                id=ingredient_data['ingredient']['id']
-            )
-            IngredientInRecipe.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=ingredient_data['amount'],
-            )
-        for tag_data in tags_data:
-            tag_id = tag_data.id
-            tag = Tag.objects.get(id=tag_id)
-            recipe.tags.add(tag)
+        recipe.tags.set(tags)
+        self.save_ingredients(recipe, ingredients_data)
+        ImageJob.objects.create(recipe=recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         '''
         Обновление существующего рецепта.
         '''
-        instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time
-        )
+        tags = validated_data.pop('tags', None)
+        ingredients_data = validated_data.pop('recipe_ingredients', None)
+        image = validated_data.get('image')
+        if image is not None and instance.is_same_image(image):
+            del validated_data['image']
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save()
 
-        ingredients_data = validated_data.get('recipe_ingredients')
-        instance.ingredients.clear()
-        for ingredient_data in ingredients_data:
-            ingredient = Ingredient.objects.get(
-                id=ingredient_data['ingredient']['id']
-            )
-            IngredientInRecipe.objects.create(
-                recipe=instance,
-                ingredient=ingredient,
-                amount=ingredient_data['amount'],
+        if 'image' in validated_data:
+            ImageJob.objects.create(recipe=instance)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients_data is not None:
+            changed_ids = self.save_ingredients(instance, ingredients_data)
+            ShoppingListItem.objects.refresh_for_recipe(
+                instance, ingredient_ids=list(changed_ids)
             )
-        tags_data = validated_data.get('tags')
-        instance.tags.clear()
-        for tag_id in tags_data:
-            tag = Tag.objects.get(name=tag_id)
-            instance.tags.add(tag)
-        instance.save()
         return instance
 
 
-class RecipeMinifiedSerializer(serializers.ModelSerializer):
+class RecipeMinifiedSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     '''
     Сериализатор для мини-объектов рецептов.
     '''
 
-    image = Base64ImageField()
+    image = ImageVariantsField(variant='thumbnail')
 
     class Meta:
         model = Recipe
@@ -235,34 +379,23 @@ class UserWithRecipesSerializer(UserSerializer):
     '''
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
         fields = UserSerializer.Meta.fields + ('recipes_count', 'recipes')
 
-    def get_recipes_count(self, obj):
-        '''
-        Возвращает количество рецептов пользователя.
-        '''
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
         '''
         Возвращает рецепты пользователя.
         '''
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit', None)
-
-        recipes = obj.recipes.all()
-
-        if recipes_limit:
-            try:
-                recipes_limit = int(recipes_limit)
-            except ValueError:
-                raise ValueError(
-                    'Значение recipes_limit должно быть целым числом.'
-                )
-            recipes = recipes[: int(recipes_limit)]
-        serializer = RecipeMinifiedSerializer(recipes, many=True)
+        recipes = getattr(obj, 'recipes_preview', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        serializer = RecipeMinifiedSerializer(
+            recipes, many=True, context=self.context
+        )
         return serializer.data
@@ -3,7 +3,8 @@ from djoser.views import TokenDestroyView
 from rest_framework.routers import DefaultRouter
 
 from api.views import (CustomTokenCreateView, CustomUserViewSet,
-                       IngredientViewSet, RecipeViewSet, TagViewSet)
+                       IngredientViewSet, MetricsView, RecipeViewSet,
+                       TagViewSet)
 
 v1_router = DefaultRouter()
 v1_router.register(r'users', CustomUserViewSet, basename='users')
@@ -17,6 +18,7 @@ auth_urls = [
 ]
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(v1_router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include(auth_urls)),
@@ -1,3 +1,7 @@
+from collections import Counter
+
+from rest_framework.exceptions import ValidationError
+
 MESSAGES = {
     'shopping_cart': {
         'cr_error': (
@@ -41,3 +45,41 @@ def is_item_linked_to_user(self, obj, model, related_field):
     if request and user.is_authenticated:
         return model.objects.filter(user=user, **{related_field: obj}).exists()
     return False
+
+
+def get_annotated_flag(self, obj, attr, model, related_field):
+    '''
+    Возвращает флаг связи объекта с пользователем из аннотации queryset,
+    а при её отсутствии выполняет запрос к базе данных.
+    '''
+    value = getattr(obj, attr, None)
+    if value is not None:
+        return value
+    return is_item_linked_to_user(self, obj, model, related_field)
+
+
+def get_recipes_limit(request):
+    '''
+    Возвращает значение параметра recipes_limit из запроса.
+    '''
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise ValidationError(
+            {'recipes_limit': 'Значение должно быть целым числом.'}
+        )
+    if recipes_limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Значение должно быть 0 или больше.'}
+        )
+    return recipes_limit
+
+
+def get_duplicates(values):
+    '''
+    Возвращает значения, встречающиеся в списке более одного раза.
+    '''
+    return [value for value, count in Counter(values).items() if count > 1]
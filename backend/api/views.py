@@ -1,6 +1,7 @@
+from functools import partial
+
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.conf import settings as djoser_settings
@@ -8,23 +9,37 @@ from djoser.utils import login_user
 from djoser.views import TokenCreateView, UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from api.filters import CustomSearchFilter, RecipeFilter
-from api.mixins import ListRetrieveViewSet
-from api.pagination import CustomPageNumberPagination
+from api.cache import recipe_feed_cache
+from api.filters import RecipeFilter
+from api.metrics import metrics
+from api.mixins import (AnonymousListCacheMixin, CatalogueViewSet,
+                        ConditionalGetMixin)
+from api.pagination import (FeedCursorPagination, RecipePagination,
+                            SubscriptionPagination)
 from api.permissions import AuthorOrReadOnly
+from api.renderers import (CSVShoppingListRenderer, PrometheusRenderer,
+                           TextShoppingListRenderer)
 from api.serializers import (IngredientSerializer, RecipeMinifiedSerializer,
                              RecipeSerializer, TagSerializer,
                              UserWithRecipesSerializer)
-from api.utilities import MESSAGES
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from api.utilities import MESSAGES, get_recipes_limit
+from recipes.catalogue import ingredient_catalogue, tag_catalogue
+from recipes.feed import feed_entries
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.versions import recipe_score_version, recipe_version, user_version
 from users.models import Subscription
 
 User = get_user_model()
 
+SHOPPING_LIST_CHUNK_SIZE = 500
+
 
 def handle_action(request, pk, model, miniserializer, error_name: str):
     '''
@@ -71,53 +86,144 @@ class CustomTokenCreateView(TokenCreateView):
         )
 
 
-class TagViewSet(ListRetrieveViewSet):
+class TagViewSet(CatalogueViewSet):
     '''
     Представление для работы с тегами.
-    Отображает список и детали тегов.
+    Отображает список и детали тегов из кэша справочника.
     '''
 
     queryset = Tag.objects.all()
+    catalogue = tag_catalogue
     permission_classes = (AllowAny,)
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(ListRetrieveViewSet):
+class IngredientViewSet(CatalogueViewSet):
     '''
     Представление для работы с ингредиентами.
-    Отображает список и детали ингредиентов.
+    Отображает список и детали ингредиентов из кэша справочника.
     Поддерживает поиск по имени ингредиента.
     '''
 
     queryset = Ingredient.objects.all()
+    catalogue = ingredient_catalogue
     permission_classes = (AllowAny,)
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (CustomSearchFilter,)
-    search_fields = ('^name',)
+
+    def get_catalogue_items(self):
+        '''
+        Возвращает ингредиенты из индекса в памяти процесса.
+        При переданном параметре name сначала идут ингредиенты,
+        название которых начинается с name, затем содержащие его.
+        '''
+        name = self.request.query_params.get('name')
+        if name:
+            return ingredient_index.search(name)
+        return ingredient_index.all()
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin, AnonymousListCacheMixin, viewsets.ModelViewSet
+):
     '''
     Представление для работы с рецептами.
     Позволяет создавать, просматривать, обновлять и удалять рецепты.
     Реализует функциональность добавления и удаления рецепта из избранного
     и корзины покупок пользователя.
-    Поддерживает фильтрацию рецептов.
+    Поддерживает фильтрацию рецептов, упорядочивание по популярности
+    и условные GET-запросы,
+    кэширует ленту рецептов для неавторизованных пользователей.
     '''
 
-    queryset = Recipe.objects.all()
     permission_classes = (AuthorOrReadOnly,)
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    list_cache = recipe_feed_cache
+
+    def get_queryset(self):
+        '''
+        Возвращает рецепты с подгруженными связанными данными
+        и флагами текущего пользователя.
+        Для списка и ленты ингредиенты подгружает RecipeListSerializer
+        только для рецептов, отсутствующих в кэше.
+        '''
+        return Recipe.objects.with_user_flags(
+            self.request.user, ingredients=self.action not in ('list', 'feed')
+        )
+
+    def get_etag(self, request):
+        '''
+        Версия ответа складывается из версий рецептов, справочников,
+        для лент по рейтингу - версии рейтингов и, для авторизованного
+        пользователя, его избранного, корзины покупок и подписок.
+        '''
+        user = request.user
+        parts = [
+            recipe_version.get(),
+            tag_catalogue.version(),
+            ingredient_catalogue.version(),
+        ]
+        if 'ordering' in request.query_params:
+            parts.append(recipe_score_version.get())
+        if user.is_authenticated:
+            parts += [user.pk, user_version(user.pk).get()]
+        return '-'.join(map(str, parts))
 
     def perform_create(self, serializer):
         '''
         Выполняет сохранение рецепта с указанием автора.
         '''
         serializer.save(author=self.request.user)
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
+    def perform_update(self, serializer):
+        '''
+        Выполняет обновление рецепта и перечитывает его
+        со связанными данными для ответа.
+        '''
+        serializer.save()
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedCursorPagination,
+    )
+    def feed(self, request):
+        '''
+        Лента рецептов авторов, на которых подписан пользователь,
+        с курсорной пагинацией по дате публикации.
+        Фильтры рецептов ограничивают ленту, но не меняют ее порядок,
+        поэтому поиск и упорядочивание по рейтингу не поддерживаются.
+        '''
+        unsupported = {'search', 'ordering'} & set(request.query_params)
+        if unsupported:
+            raise ValidationError(
+                {
+                    param: 'Лента упорядочена по дате публикации.'
+                    for param in unsupported
+                }
+            )
+        recipes = None
+        if set(request.query_params) & set(self.filterset_class.base_filters):
+            recipes = self.filter_queryset(Recipe.objects.all()).values('pk')
+        recipe_ids = self.paginator.paginate_entries(
+            partial(feed_entries, request.user, recipes=recipes), request
+        )
+        page = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [page[pk] for pk in recipe_ids if pk in page], many=True
+        )
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post', 'delete'])
     def favorite(self, request, pk=None):
@@ -141,35 +247,39 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'shopping_cart',
         )
 
-    @action(detail=False, methods=['get'])
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            TextShoppingListRenderer,
+            CSVShoppingListRenderer,
+        ),
+    )
     def download_shopping_cart(self, request, pk=None):
         '''
-        Скачивает содержимое корзины покупок пользователя
-        и сохраняет его в TXT файл.
+        Скачивает содержимое корзины покупок пользователя.
+        Формат файла (txt или csv) выбирается параметром format,
+        файл передается потоком по мере чтения строк из базы данных.
         '''
         ingredients = (
-            IngredientInRecipe.objects.filter(
-                recipe__is_in_shopping_cart__user=request.user
-            )
-            .values('ingredient')
-            .annotate(sum_amount=Sum('amount'))
+            ShoppingListItem.objects.filter(user=request.user)
             .values_list(
                 'ingredient__name',
-                'sum_amount',
+                'amount',
                 'ingredient__measurement_unit',
             )
+            .order_by('ingredient__name')
+            .iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
         )
 
-        content = 'Список покупок:\n'
-        for i, ingredient in enumerate(ingredients, start=1):
-            content += (
-                f'{i}. {ingredient[0]} - '
-                f'{ingredient[1]} '
-                f'{ingredient[2]}\n'
-            )
-        response = HttpResponse(content, content_type='text/plain')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
         response['Content-Disposition'] = (
-            'attachment; ' 'filename="shopping_list.txt"'
+            f'attachment; filename="{renderer.get_filename()}"'
         )
         return response
 
@@ -184,7 +294,7 @@ class CustomUserViewSet(UserViewSet):
     @action(
         methods=['get'],
         detail=False,
-        pagination_class=CustomPageNumberPagination,
+        pagination_class=SubscriptionPagination,
         permission_classes=(IsAuthenticated,),
     )
     def subscriptions(self, request):
@@ -194,7 +304,12 @@ class CustomUserViewSet(UserViewSet):
         '''
         user = request.user
 
-        queryset = User.objects.filter(subscribing__user=user)
+        queryset = (
+            User.objects.filter(subscribing__user=user)
+            .with_is_subscribed(user)
+            .with_recipes(get_recipes_limit(request))
+            .order_by(*User._meta.ordering)
+        )
         paginator = self.pagination_class()
 
         result_page = paginator.paginate_queryset(queryset, request)
@@ -242,3 +357,15 @@ class CustomUserViewSet(UserViewSet):
                     {'errors': MESSAGES['subscribe']['del_error']},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+
+
+class MetricsView(APIView):
+    '''
+    Показатели запросов к API в формате Prometheus.
+    '''
+
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(metrics.render())
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+from datetime import datetime, timezone
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'rest_framework.authtoken',
@@ -53,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,6 +101,41 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', BASE_DIR / 'cache'),
+        # Фрагменты рецептов, версии и ответы ленты занимают по ключу
+        # на объект, при стандартных 300 записях кэш постоянно удалял бы
+        # случайные ключи, включая версии. Файловый кэш перечисляет
+        # каталог при каждой записи, поэтому для больших объемов данных
+        # следует указать CACHE_BACKEND с сетевым кэшем (Redis, Memcached).
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+        },
+    }
+}
+
+SHARED_CACHE_ALIAS = 'default'
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', 86400))
+CATALOGUE_LOCAL_TTL = int(os.getenv('CATALOGUE_LOCAL_TTL', 5))
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_TIMEOUT', 86400)
+)
+
+
+# Performance metrics
+
+SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', 1))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -144,6 +182,43 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Recipe images
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+RECIPE_IMAGE_VARIANTS_DIR = 'recipes/variants'
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', 10485760))
+RECIPE_IMAGE_MAX_DIMENSIONS = (
+    int(os.getenv('RECIPE_IMAGE_MAX_WIDTH', 4096)),
+    int(os.getenv('RECIPE_IMAGE_MAX_HEIGHT', 4096)),
+)
+RECIPE_IMAGE_QUALITY = int(os.getenv('RECIPE_IMAGE_QUALITY', 85))
+MEDIA_GC_GRACE_PERIOD = int(os.getenv('MEDIA_GC_GRACE_PERIOD', 3600))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_JOB_POLL_INTERVAL = int(os.getenv('IMAGE_JOB_POLL_INTERVAL', 2))
+IMAGE_JOB_TIMEOUT = int(os.getenv('IMAGE_JOB_TIMEOUT', 300))
+IMAGE_JOB_MAX_ATTEMPTS = int(os.getenv('IMAGE_JOB_MAX_ATTEMPTS', 3))
+
+
+# Recipe popularity scores
+
+RECIPE_SCORE_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+RECIPE_SCORE_HALF_LIFE = int(os.getenv('RECIPE_SCORE_HALF_LIFE', 86400))
+RECIPE_SCORE_REFRESH_INTERVAL = int(
+    os.getenv('RECIPE_SCORE_REFRESH_INTERVAL', 300)
+)
+
+
+# Subscription feed
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 100))
+FEED_INSERT_BATCH_SIZE = 1000
+
+
 AUTH_USER_MODEL = 'users.User'
 
 
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes.models import (Favorite, ImageJob, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag)
 
 
 class IngredientInRecipeInline(admin.TabularInline):
@@ -11,19 +11,11 @@ class IngredientInRecipeInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author', 'get_favorite_count')
+    list_display = ('pk', 'name', 'author', 'favorites_count')
     list_filter = ('name', 'author', 'tags')
     search_fields = ('name', 'author__username')
     inlines = (IngredientInRecipeInline,)
 
-    def get_favorite_count(self, obj):
-        '''
-        Возвращает количество добавлений в избранное для рецепта.
-        '''
-        return obj.is_favorited.count()
-
-    get_favorite_count.short_description = 'Добавления в избранное'
-
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -47,3 +39,11 @@ class TagAdmin(admin.ModelAdmin):
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'measurement_unit')
     list_editable = ('name', 'measurement_unit')
+    search_fields = ('^name',)
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'recipe', 'status', 'attempts', 'updated')
+    list_filter = ('status',)
+    readonly_fields = ('created', 'updated')
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from recipes.models import Ingredient, Tag
+from recipes.versions import CacheVersion
+
+
+class CatalogueCache:
+    '''
+    Двухуровневый кэш справочника.
+    Общий уровень хранится в кэше Django под ключом текущей версии,
+    локальный уровень хранит копию в памяти процесса и сверяет версию
+    с общим уровнем не чаще раза в CATALOGUE_LOCAL_TTL секунд.
+    Инвалидация увеличивает версию, поэтому устаревшие данные
+    не читаются ни одним процессом.
+    Кроме словаря по первичному ключу строит словари
+    по полям lookup_fields.
+    '''
+
+    def __init__(self, name, queryset, lookup_fields=()):
+        self.name = name
+        self.queryset = queryset
+        self.lookup_fields = lookup_fields
+        self.shared_version = CacheVersion(f'catalogue:{name}')
+        self._lock = threading.Lock()
+        self._version = None
+        self._shared_version = None
+        self._checked_at = 0.0
+        self._data = ()
+        self._by_id = {}
+        self._by_field = {}
+
+    @property
+    def shared(self):
+        return caches[settings.SHARED_CACHE_ALIAS]
+
+    def data_key(self, version):
+        return f'catalogue:{self.name}:{version}'
+
+    def version(self):
+        '''
+        Возвращает текущую версию справочника, запрашивая ее
+        из общего кэша не чаще раза в CATALOGUE_LOCAL_TTL секунд.
+        '''
+        now = time.monotonic()
+        if (
+            self._shared_version is None
+            or now - self._checked_at > settings.CATALOGUE_LOCAL_TTL
+        ):
+            self._shared_version = self.shared_version.get()
+            self._checked_at = now
+        return self._shared_version
+
+    def invalidate(self):
+        '''
+        Увеличивает версию справочника и сбрасывает локальную копию.
+        '''
+        self.shared_version.bump()
+        self._shared_version = None
+        self._version = None
+
+    def _load(self, version):
+        data = self.shared.get(self.data_key(version))
+        if data is None:
+            data = tuple(self.queryset.all())
+            self.shared.set(
+                self.data_key(version), data, settings.CATALOGUE_CACHE_TIMEOUT
+            )
+        self._data = data
+        self._by_id = {item.pk: item for item in data}
+        self._by_field = {
+            field: {getattr(item, field): item for item in data}
+            for field in self.lookup_fields
+        }
+        self._version = version
+
+    def _sync(self):
+        version = self.version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load(version)
+
+    def all(self):
+        '''
+        Возвращает все элементы справочника.
+        '''
+        self._sync()
+        return self._data
+
+    def by_id(self):
+        '''
+        Возвращает словарь элементов справочника по первичному ключу.
+        '''
+        self._sync()
+        return self._by_id
+
+    def by_field(self, field):
+        '''
+        Возвращает словарь элементов справочника по значению поля field
+        из lookup_fields.
+        '''
+        self._sync()
+        return self._by_field[field]
+
+
+tag_catalogue = CatalogueCache(
+    'tags', Tag.objects.all(), lookup_fields=('slug',)
+)
+ingredient_catalogue = CatalogueCache('ingredients', Ingredient.objects.all())
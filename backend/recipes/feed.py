@@ -0,0 +1,128 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import FeedItem, Recipe
+from users.models import Subscription, User
+
+
+def insert_feed_items(items):
+    '''
+    Сохраняет элементы лент пакетами, пропуская уже существующие.
+    '''
+    items = iter(items)
+    while batch := list(islice(items, settings.FEED_INSERT_BATCH_SIZE)):
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe_id, author_id, create_date):
+    '''
+    Рассылает рецепт в ленты подписчиков автора, если у автора
+    не более FEED_FANOUT_LIMIT подписчиков, и отмечает его разосланным.
+    Неразосланные рецепты читаются лентами из рецептов авторов,
+    поэтому решение не меняется при изменении числа подписчиков.
+    '''
+    if not User.objects.filter(
+        pk=author_id, subscribers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    subscriber_ids = (
+        Subscription.objects.filter(subscribing=author_id)
+        .values_list('user', flat=True)
+        .iterator(chunk_size=settings.FEED_INSERT_BATCH_SIZE)
+    )
+    insert_feed_items(
+        FeedItem(user_id=user_id, recipe_id=recipe_id, create_date=create_date)
+        for user_id in subscriber_ids
+    )
+    Recipe.objects.filter(pk=recipe_id).update(fanned_out=True)
+
+
+def latest_recipes(author_ids):
+    '''
+    Возвращает id и даты публикации последних FEED_BACKFILL_SIZE
+    разосланных по лентам рецептов авторов author_ids.
+    '''
+    recipes = (
+        Recipe.objects.filter(author__in=author_ids, fanned_out=True)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('create_date').desc(), F('id').desc()),
+            )
+        )
+        .filter(position__lte=settings.FEED_BACKFILL_SIZE)
+        .values_list('author', 'pk', 'create_date')
+    )
+    latest = defaultdict(list)
+    for author_id, recipe_id, create_date in recipes:
+        latest[author_id].append((recipe_id, create_date))
+    return latest
+
+
+def backfill_feeds(subscriptions):
+    '''
+    Добавляет в ленты подписчиков последние рецепты авторов
+    по парам (id подписчика, id автора).
+    '''
+    subscriptions = list(subscriptions)
+    latest = latest_recipes({author_id for _, author_id in subscriptions})
+    insert_feed_items(
+        FeedItem(user_id=user_id, recipe_id=recipe_id, create_date=date)
+        for user_id, author_id in subscriptions
+        for recipe_id, date in latest[author_id]
+    )
+
+
+def remove_from_feed(user_id, author_id):
+    '''
+    Удаляет рецепты автора из ленты пользователя.
+    '''
+    FeedItem.objects.filter(user=user_id, recipe__author=author_id).delete()
+
+
+def before(position, date_field, id_field):
+    '''
+    Возвращает условие "раньше position" для пары
+    (дата публикации, id рецепта) в порядке убывания.
+    '''
+    date, recipe_id = position
+    return Q(**{f'{date_field}__lt': date}) | Q(
+        **{date_field: date, f'{id_field}__lt': recipe_id}
+    )
+
+
+def feed_entries(user, limit, position=None, recipes=None):
+    '''
+    Возвращает до limit пар (дата публикации, id рецепта) ленты
+    пользователя по убыванию, начиная после position.
+    Разосланные рецепты читаются из ленты по индексу
+    (user, -create_date, -recipe), неразосланные - из рецептов авторов
+    по частичному индексу recipe_pulled_idx; обе выборки ограничены
+    limit и объединяются в памяти.
+    recipes - необязательный подзапрос id допустимых рецептов.
+    '''
+    inbox = FeedItem.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        author__subscribing__user=user, fanned_out=False
+    ).exclude(feed_items__user=user)
+    if recipes is not None:
+        inbox = inbox.filter(recipe__in=recipes)
+        pulled = pulled.filter(pk__in=recipes)
+    if position is not None:
+        inbox = inbox.filter(before(position, 'create_date', 'recipe'))
+        pulled = pulled.filter(before(position, 'create_date', 'id'))
+    entries = list(
+        inbox.order_by('-create_date', '-recipe_id').values_list(
+            'create_date', 'recipe'
+        )[:limit]
+    )
+    entries += pulled.order_by('-create_date', '-id').values_list(
+        'create_date', 'id'
+    )[:limit]
+    return heapq.nlargest(limit, entries)
@@ -0,0 +1,99 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipes.models import ImageJob, Recipe
+from recipes.versions import recipe_version
+
+VARIANT_FORMATS = (('jpg', 'JPEG'), ('webp', 'WEBP'))
+
+
+def render_variant(original, size, image_format):
+    '''
+    Возвращает копию картинки, вписанную в size, в формате image_format.
+    '''
+    image = original.copy()
+    image.thumbnail(size)
+    buffer = BytesIO()
+    image.save(
+        buffer, image_format, quality=settings.RECIPE_IMAGE_QUALITY
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(recipe):
+    '''
+    Сохраняет уменьшенные копии картинки рецепта во всех форматах
+    и возвращает словарь путей к ним по названию и расширению.
+    '''
+    with recipe.image.open('rb') as file, Image.open(file) as source:
+        original = ImageOps.exif_transpose(source).convert('RGB')
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    variants = {}
+    for name, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        variants[name] = {
+            ext: default_storage.save(
+                f'{settings.RECIPE_IMAGE_VARIANTS_DIR}/{recipe.pk}/'
+                f'{stem}_{name}.{ext}',
+                render_variant(original, size, image_format),
+            )
+            for ext, image_format in VARIANT_FORMATS
+        }
+    return variants
+
+
+def delete_variants(variants):
+    '''
+    Удаляет файлы уменьшенных копий картинки.
+    '''
+    for paths in variants.values():
+        for path in paths.values():
+            default_storage.delete(path)
+
+
+def update_job(job, status, error):
+    '''
+    Сохраняет статус и ошибку задачи.
+    Задача могла быть удалена вместе с рецептом во время обработки,
+    в этом случае сохранять нечего.
+    '''
+    job.status = status
+    job.error = error
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=status, error=error, updated=timezone.now()
+    )
+
+
+def process_job(job):
+    '''
+    Создает уменьшенные копии картинки рецепта из задачи и сохраняет
+    пути к ним в рецепте, если картинка не сменилась за время обработки.
+    '''
+    recipe = job.recipe
+    variants = generate_variants(recipe)
+    updated = Recipe.objects.filter(
+        pk=recipe.pk, image=recipe.image.name
+    ).update(image_variants=variants, update_date=timezone.now())
+    if updated:
+        delete_variants(recipe.image_variants)
+        recipe_version.bump()
+    else:
+        delete_variants(variants)
+    update_job(job, ImageJob.Status.DONE, '')
+
+
+def fail_job(job, error):
+    '''
+    Возвращает задачу в очередь или, если попытки исчерпаны,
+    помечает ее ошибочной.
+    '''
+    if job.attempts + 1 >= settings.IMAGE_JOB_MAX_ATTEMPTS:
+        status = ImageJob.Status.FAILED
+    else:
+        status = ImageJob.Status.PENDING
+    update_job(job, status, str(error))
@@ -0,0 +1,62 @@
+import bisect
+import threading
+
+from recipes.catalogue import ingredient_catalogue
+
+
+class IngredientIndex:
+    '''
+    Индекс названий ингредиентов в памяти процесса.
+    Хранит отсортированный список названий и ищет по нему
+    сначала совпадения по префиксу, затем по подстроке.
+    Перестраивается при смене версии справочника ингредиентов.
+    '''
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self._lock = threading.Lock()
+        self._data = ((), ())
+        self._version = None
+
+    def _load(self, version):
+        ingredients = sorted(
+            self.catalogue.all(),
+            key=lambda ingredient: (ingredient.name.casefold(), ingredient.id),
+        )
+        keys = tuple(ingredient.name.casefold() for ingredient in ingredients)
+        self._data = (keys, tuple(ingredients))
+        self._version = version
+
+    def _get_data(self):
+        version = self.catalogue.version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load(version)
+        return self._data
+
+    def all(self):
+        '''
+        Возвращает все ингредиенты, отсортированные по названию.
+        '''
+        return list(self._get_data()[1])
+
+    def search(self, query):
+        '''
+        Возвращает ингредиенты, название которых начинается с query,
+        а за ними ингредиенты, название которых содержит query.
+        '''
+        keys, ingredients = self._get_data()
+        query = query.casefold()
+        start = end = bisect.bisect_left(keys, query)
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        substring_matches = [
+            ingredient
+            for key, ingredient in zip(keys, ingredients)
+            if query in key and not key.startswith(query)
+        ]
+        return list(ingredients[start:end]) + substring_matches
+
+
+ingredient_index = IngredientIndex(ingredient_catalogue)
@@ -0,0 +1,176 @@
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, ShoppingListItem
+
+User = get_user_model()
+
+QUERY_BUDGETS = {
+    'recipes': 5,
+    'recipes_anonymous': 4,
+    'recipes_trending': 5,
+    'recipes_feed': 6,
+    'recipe_detail': 5,
+    'subscriptions': 5,
+    'ingredients_search': 2,
+    'download_shopping_cart': 4,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержки, количества SQL запросов и памяти основных '
+        'эндпоинтов API на данных текущей БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Количество запросов к каждому эндпоинту',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            default=None,
+            help='id пользователя, от имени которого выполняются запросы',
+        )
+
+    def get_user(self, user_id):
+        '''
+        Возвращает пользователя из параметров или первого
+        пользователя со списком покупок.
+        '''
+        if user_id is not None:
+            return User.objects.get(pk=user_id)
+        item = (
+            ShoppingListItem.objects.values('user')
+            .order_by('user')
+            .first()
+        )
+        if item is None:
+            raise CommandError(
+                'Нет пользователей со списком покупок, '
+                'заполните БД командой generate_dataset.'
+            )
+        return User.objects.get(pk=item['user'])
+
+    def get_endpoints(self, user):
+        '''
+        Возвращает замеряемые эндпоинты: название, адрес
+        и пользователя запроса.
+        '''
+        recipe = Recipe.objects.order_by('-create_date', '-id').first()
+        if recipe is None:
+            raise CommandError(
+                'В БД нет рецептов, заполните ее командой generate_dataset.'
+            )
+        return (
+            ('recipes', '/api/recipes/?limit=6', user),
+            ('recipes_anonymous', '/api/recipes/?limit=6', None),
+            (
+                'recipes_trending',
+                '/api/recipes/?limit=6&ordering=trending',
+                user,
+            ),
+            ('recipes_feed', '/api/recipes/feed/?limit=6', user),
+            ('recipe_detail', f'/api/recipes/{recipe.pk}/', user),
+            (
+                'subscriptions',
+                '/api/users/subscriptions/?recipes_limit=3',
+                user,
+            ),
+            ('ingredients_search', '/api/ingredients/?name=са', None),
+            (
+                'download_shopping_cart',
+                '/api/recipes/download_shopping_cart/',
+                user,
+            ),
+        )
+
+    def request(self, client, url):
+        '''
+        Выполняет запрос, дочитывая потоковый ответ,
+        и возвращает ответ и количество SQL запросов.
+        '''
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(
+                f'{url} вернул статус {response.status_code}.'
+            )
+        return response, len(queries)
+
+    def measure(self, client, url, iterations):
+        '''
+        Возвращает задержки запросов в миллисекундах, наибольшее
+        количество SQL запросов и пик выделенной памяти в КиБ.
+        Первый запрос выполняется с пустым кэшем.
+        '''
+        caches[settings.SHARED_CACHE_ALIAS].clear()
+        timings = []
+        query_counts = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            _, query_count = self.request(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(query_count)
+
+        caches[settings.SHARED_CACHE_ALIAS].clear()
+        tracemalloc.start()
+        try:
+            self.request(client, url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return timings, max(query_counts), peak / 1024
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 2:
+            raise CommandError('Количество запросов должно быть 2 и более.')
+        user = self.get_user(options['user'])
+        server_name = settings.ALLOWED_HOSTS[0]
+
+        self.stdout.write(
+            f'{"Эндпоинт":<24}{"p50, мс":>9}{"p95, мс":>9}{"p99, мс":>9}'
+            f'{"Запросы":>9}{"Бюджет":>8}{"Память, КиБ":>13}'
+        )
+        exceeded = []
+        for name, url, request_user in self.get_endpoints(user):
+            client = APIClient(SERVER_NAME=server_name)
+            client.force_authenticate(request_user)
+            timings, query_count, peak = self.measure(
+                client, url, iterations
+            )
+            percentiles = statistics.quantiles(timings, n=100)
+            budget = QUERY_BUDGETS[name]
+            self.stdout.write(
+                f'{name:<24}{statistics.median(timings):>9.1f}'
+                f'{percentiles[94]:>9.1f}{percentiles[98]:>9.1f}'
+                f'{query_count:>9}{budget:>8}{peak:>13.0f}'
+            )
+            if query_count > budget:
+                exceeded.append(f'{name} ({query_count} > {budget})')
+
+        if exceeded:
+            raise CommandError(
+                'Превышен бюджет SQL запросов: {}.'.format(
+                    ', '.join(exceeded)
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Бюджеты SQL запросов соблюдены.')
+        )
@@ -0,0 +1,78 @@
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+
+def walk(storage, root):
+    '''
+    Возвращает имена всех файлов хранилища в каталоге root
+    и его подкаталогах.
+    '''
+    if not storage.exists(root):
+        return
+    directories, files = storage.listdir(root)
+    for name in files:
+        yield posixpath.join(root, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(root, directory))
+
+
+class Command(BaseCommand):
+    help = 'Удаление картинок рецептов, на которые не ссылается ни один рецепт'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести файлы, которые будут удалены',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=settings.MEDIA_GC_GRACE_PERIOD,
+            help='Не удалять файлы моложе указанного числа секунд',
+        )
+
+    def get_used_files(self):
+        '''
+        Возвращает множества имен картинок и их уменьшенных копий,
+        на которые ссылаются рецепты.
+        '''
+        images = set()
+        variants = set()
+        recipes = Recipe.objects.values_list('image', 'image_variants')
+        for image, image_variants in recipes.iterator():
+            images.add(image)
+            for paths in image_variants.values():
+                variants.update(paths.values())
+        return images, variants
+
+    def handle(self, *args, **options):
+        images, variants = self.get_used_files()
+        field = Recipe._meta.get_field('image')
+        threshold = timezone.now() - timedelta(seconds=options['grace'])
+        removed = 0
+        for storage, root, used in (
+            (field.storage, field.upload_to.rstrip('/'), images),
+            (default_storage, settings.RECIPE_IMAGE_VARIANTS_DIR, variants),
+        ):
+            for name in walk(storage, root):
+                if (
+                    name in used
+                    or storage.get_modified_time(name) > threshold
+                ):
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    storage.delete(name)
+                removed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Неиспользуемых файлов: {removed}.')
+        )
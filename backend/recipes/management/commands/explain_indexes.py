@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import (FeedItem, Ingredient, Recipe, RecipeScore,
+                            ShoppingListItem, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def get_query_shapes(user_id, tag_ids):
+    '''
+    Возвращает запросы API и индексы, которые они должны использовать.
+    '''
+    return (
+        (
+            'Рецепты автора',
+            Recipe.objects.filter(author=user_id).order_by(
+                '-create_date', '-id'
+            )[:6],
+            'recipe_author_create_date_idx',
+        ),
+        (
+            'Избранное пользователя',
+            Recipe.objects.filter(is_favorited__user=user_id),
+            'unique_favorite',
+        ),
+        (
+            'Корзина покупок пользователя',
+            Recipe.objects.filter(is_in_shopping_cart__user=user_id),
+            'unique_shopping_cart',
+        ),
+        (
+            'Рецепты с тегами',
+            Recipe.tags.through.objects.filter(tag__in=tag_ids).values(
+                'recipe'
+            ),
+            'recipe_tags_tag_recipe_idx',
+        ),
+        (
+            'Подписчики автора',
+            Subscription.objects.filter(subscribing=user_id).values('user'),
+            'subscription_subscribing_idx',
+        ),
+        (
+            'Подписки пользователя',
+            Subscription.objects.filter(user=user_id).values('subscribing'),
+            'unique_subscription',
+        ),
+        (
+            'Поиск ингредиента по началу названия',
+            Ingredient.objects.filter(name__istartswith='са'),
+            'ingredient_name_prefix_idx',
+        ),
+        (
+            'Список покупок пользователя',
+            ShoppingListItem.objects.filter(user=user_id),
+            'unique_shopping_list_item',
+        ),
+        (
+            'Лента подписок',
+            FeedItem.objects.filter(user=user_id)
+            .order_by('-create_date', '-recipe_id')
+            .values('recipe')[:6],
+            'feed_item_user_date_idx',
+        ),
+        (
+            'Рецепты в тренде',
+            RecipeScore.objects.order_by('-trending', '-recipe')[:6],
+            'recipe_score_trending_idx',
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка планов EXPLAIN основных запросов API: '
+        'каждый запрос должен использовать свой индекс'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Выводить планы запросов',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('pk').first()
+        user_id = user.pk if user else 0
+        tag_ids = list(Tag.objects.values_list('pk', flat=True)[:2]) or [0]
+        failed = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Без данных PostgreSQL предпочитает последовательное
+                # чтение, поэтому проверяется доступность индекса.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, queryset, index in get_query_shapes(user_id, tag_ids):
+                plan = queryset.explain()
+                used = index in plan
+                self.stdout.write(
+                    f'{"OK  " if used else "FAIL"} {name}: {index}'
+                )
+                if options['verbose_plans'] or not used:
+                    self.stdout.write(plan)
+                if not used:
+                    failed.append(name)
+        if failed:
+            raise CommandError(
+                'Запросы не используют индексы: {}.'.format(', '.join(failed))
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Все запросы используют индексы.')
+        )
@@ -0,0 +1,328 @@
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from PIL import Image
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.versions import recipe_version
+from users.models import Subscription
+
+User = get_user_model()
+
+DISHES = (
+    'Суп', 'Салат', 'Пирог', 'Рагу', 'Омлет', 'Паста', 'Каша', 'Запеканка',
+    'Плов', 'Блины',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'летний', 'острый', 'бабушкин', 'праздничный',
+    'постный', 'сытный', 'легкий', 'пряный',
+)
+SENTENCES = (
+    'Подготовьте все ингредиенты заранее.',
+    'Нарежьте овощи небольшими кубиками.',
+    'Обжарьте на среднем огне до золотистого цвета.',
+    'Тушите под крышкой, периодически помешивая.',
+    'Посолите и поперчите по вкусу.',
+    'Подавайте горячим, посыпав зеленью.',
+)
+
+INSERT_BATCH_SIZE = 1000
+
+worker_data = {}
+
+
+def init_worker(data):
+    '''
+    Сохраняет общие для задач данные в процессе пула.
+    '''
+    worker_data.update(data)
+
+
+def create_recipes(seed, count):
+    '''
+    Создает пакет рецептов с тегами и ингредиентами
+    и возвращает их id.
+    '''
+    rng = random.Random(seed)
+    tag_ids = worker_data['tag_ids']
+    ingredient_ids = worker_data['ingredient_ids']
+    recipes = Recipe.objects.bulk_create(
+        [
+            Recipe(
+                author_id=rng.choice(worker_data['author_ids']),
+                name=f'{rng.choice(DISHES)} {rng.choice(ADJECTIVES)}',
+                text=' '.join(rng.sample(SENTENCES, k=rng.randint(2, 5))),
+                cooking_time=rng.randint(5, 180),
+                image=worker_data['image'],
+            )
+            for _ in range(count)
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    Recipe.tags.through.objects.bulk_create(
+        [
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe in recipes
+            for tag_id in rng.sample(
+                tag_ids, k=rng.randint(1, min(3, len(tag_ids)))
+            )
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    IngredientInRecipe.objects.bulk_create(
+        [
+            IngredientInRecipe(
+                recipe_id=recipe.pk,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe in recipes
+            for ingredient_id in rng.sample(
+                ingredient_ids,
+                k=min(rng.randint(3, 12), len(ingredient_ids)),
+            )
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    recipe_ids = [recipe.pk for recipe in recipes]
+    Recipe.objects.filter(pk__in=recipe_ids).update_search_vector()
+    return recipe_ids
+
+
+def sample(rng, population, limit, exclude=None):
+    '''
+    Возвращает до limit случайных элементов population без exclude.
+    '''
+    k = min(rng.randint(0, limit), len(population))
+    items = rng.sample(population, k=k)
+    return [item for item in items if item != exclude]
+
+
+def create_interactions(seed, user_ids):
+    '''
+    Создает избранное, корзины покупок и подписки пакета пользователей
+    и пересчитывает их списки покупок.
+    '''
+    rng = random.Random(seed)
+    recipe_ids = worker_data['recipe_ids']
+    author_ids = worker_data['author_ids']
+    favorites, carts, subscriptions = [], [], []
+    for user_id in user_ids:
+        favorites.extend(
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in sample(
+                rng, recipe_ids, worker_data['favorites']
+            )
+        )
+        carts.extend(
+            ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in sample(rng, recipe_ids, worker_data['carts'])
+        )
+        subscriptions.extend(
+            Subscription(user_id=user_id, subscribing_id=author_id)
+            for author_id in sample(
+                rng, author_ids, worker_data['subscriptions'], user_id
+            )
+        )
+    for model, objects in (
+        (Favorite, favorites),
+        (ShoppingCart, carts),
+        (Subscription, subscriptions),
+    ):
+        model.objects.bulk_create(
+            objects, batch_size=INSERT_BATCH_SIZE, ignore_conflicts=True
+        )
+    ShoppingListItem.objects.refresh(
+        user_ids, worker_data['ingredient_ids']
+    )
+    return len(favorites) + len(carts) + len(subscriptions)
+
+
+class Command(BaseCommand):
+    help = 'Генерация синтетических данных для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000, help='Количество пользователей'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000, help='Количество рецептов'
+        )
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Максимум рецептов в избранном у пользователя',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=5,
+            help='Максимум рецептов в корзине покупок пользователя',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Максимум подписок пользователя',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Количество объектов в одной задаче',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество процессов',
+        )
+        parser.add_argument(
+            '--password',
+            default='loadtest-password',
+            help='Пароль создаваемых пользователей',
+        )
+        parser.add_argument('--seed', type=int, default=None)
+
+    def report(self, label, count, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{label}: {count} за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-6):.0f} в секунду).'
+        )
+
+    def create_users(self, count, password, batch_size):
+        '''
+        Создает пользователей с общим хэшем пароля и возвращает их id.
+        '''
+        started = time.monotonic()
+        run = uuid.uuid4().hex[:8]
+        password = make_password(password)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f'load_{run}_{number}',
+                    email=f'load_{run}_{number}@example.com',
+                    first_name='Пользователь',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=batch_size,
+        )
+        self.report('Пользователи', count, started)
+        return [user.pk for user in users]
+
+    def save_image(self):
+        '''
+        Сохраняет общую для всех рецептов картинку и возвращает ее имя.
+        '''
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), (200, 120, 60)).save(buffer, 'JPEG')
+        field = Recipe._meta.get_field('image')
+        return field.storage.save(
+            field.generate_filename(None, 'synthetic.jpg'),
+            ContentFile(buffer.getvalue()),
+        )
+
+    def run_pool(self, workers, function, tasks, data):
+        '''
+        Выполняет задачи в пуле процессов и возвращает их результаты.
+        Соединения с БД закрываются до создания процессов, чтобы
+        каждый процесс открыл собственное.
+        '''
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=init_worker,
+            initargs=(data,),
+        ) as pool:
+            return list(pool.map(function, *zip(*tasks)))
+
+    def handle(self, *args, **options):
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        if not tag_ids or not ingredient_ids:
+            raise CommandError(
+                'Для генерации рецептов нужны теги и ингредиенты, '
+                'загрузите их командой import_json и через админку.'
+            )
+        if options['users'] < 1:
+            raise CommandError(
+                'Количество пользователей должно быть 1 и более.'
+            )
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        author_ids = self.create_users(
+            options['users'], options['password'], batch_size
+        )
+
+        started = time.monotonic()
+        data = {
+            'author_ids': author_ids,
+            'tag_ids': tag_ids,
+            'ingredient_ids': ingredient_ids,
+            'image': self.save_image(),
+        }
+        tasks = [
+            (rng.getrandbits(64), min(batch_size, options['recipes'] - start))
+            for start in range(0, options['recipes'], batch_size)
+        ]
+        recipe_ids = [
+            pk
+            for batch in self.run_pool(
+                options['workers'], create_recipes, tasks, data
+            )
+            for pk in batch
+        ]
+        self.report('Рецепты', len(recipe_ids), started)
+
+        if recipe_ids:
+            started = time.monotonic()
+            data.update(
+                recipe_ids=recipe_ids,
+                favorites=options['favorites'],
+                carts=options['carts'],
+                subscriptions=options['subscriptions'],
+            )
+            tasks = [
+                (rng.getrandbits(64), author_ids[start:start + batch_size])
+                for start in range(0, len(author_ids), batch_size)
+            ]
+            created = sum(
+                self.run_pool(
+                    options['workers'], create_interactions, tasks, data
+                )
+            )
+            self.report(
+                'Избранное, корзины покупок и подписки', created, started
+            )
+
+        call_command('recount_counters', stdout=self.stdout)
+        Recipe.objects.filter(
+            author__in=author_ids,
+            author__subscribers_count__lte=settings.FEED_FANOUT_LIMIT,
+        ).update(fanned_out=True)
+        call_command('refresh_recipe_scores', full=True, stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        recipe_version.bump()
+        self.stdout.write(
+            self.style.SUCCESS('Генерация данных прошла успешно.')
+        )
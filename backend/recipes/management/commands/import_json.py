@@ -1,34 +1,110 @@
+import csv
 import json
+import time
+from itertools import islice
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from recipes.catalogue import ingredient_catalogue
 from recipes.models import Ingredient
 
+READ_CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = ' \t\r\n,'
+
+
+def iter_json(file):
+    '''
+    Возвращает элементы JSON-массива из файла по одному,
+    читая файл частями.
+    '''
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        while position < len(buffer) and buffer[position] in JSON_SEPARATORS:
+            position += 1
+        if position == len(buffer):
+            buffer, position = file.read(READ_CHUNK_SIZE), 0
+            if not buffer:
+                raise CommandError('Неожиданный конец JSON файла.')
+            continue
+        if not started:
+            if buffer[position] != '[':
+                raise CommandError('JSON файл должен содержать массив.')
+            started = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON файл.')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+def iter_csv(file):
+    '''
+    Возвращает строки CSV файла вида "название,единица измерения".
+    '''
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+READERS = {'.json': iter_json, '.csv': iter_csv}
+
 
 class Command(BaseCommand):
-    help = 'Загрузка данных из JSON файла в таблицу Ingredients'
-
-    def handle(self, *args, **kwargs):
-        with open(
-            settings.FILE_INGREDIENTS_PATH, 'r', encoding='utf8'
-        ) as file:
-            data = json.load(file)
-
-            ingredients_to_create = []
-            for item in data:
-                name = item['name']
-                measurement_unit = item['measurement_unit']
-
-                if not Ingredient.objects.filter(
-                    name=name, measurement_unit=measurement_unit
-                ).exists():
-                    ingredients_to_create.append(
-                        Ingredient(
-                            name=name, measurement_unit=measurement_unit
-                        )
-                    )
-            Ingredient.objects.bulk_create(ingredients_to_create)
+    help = 'Загрузка ингредиентов из JSON или CSV файла в таблицу Ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=settings.FILE_INGREDIENTS_PATH,
+            type=Path,
+            help='Путь к файлу .json или .csv',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одном запросе',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .json и .csv.')
+
+        count_before = Ingredient.objects.count()
+        started = time.monotonic()
+        rows = 0
+        with open(path, 'r', encoding='utf8') as file:
+            ingredients = (
+                Ingredient(name=name.strip(), measurement_unit=unit.strip())
+                for name, unit in reader(file)
+            )
+            while batch := list(islice(ingredients, options['batch_size'])):
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                rows += len(batch)
+        ingredient_catalogue.invalidate()
+
+        elapsed = time.monotonic() - started
+        created = Ingredient.objects.count() - count_before
         self.stdout.write(
-            self.style.SUCCESS('Загрузка данных прошла успешно.')
+            self.style.SUCCESS(
+                f'Загрузка данных прошла успешно. Обработано строк: {rows}, '
+                f'добавлено: {created}, {rows / max(elapsed, 1e-6):.0f} '
+                f'строк/с.'
+            )
         )
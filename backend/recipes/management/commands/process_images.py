@@ -0,0 +1,67 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes.images import fail_job, process_job
+from recipes.models import ImageJob
+
+logger = logging.getLogger('foodgram.images')
+
+
+def run_job(job):
+    '''
+    Обрабатывает задачу в потоке пула и закрывает его соединение с БД.
+    Ошибка сохранения неудачной задачи только записывается в журнал,
+    чтобы не завершать обработчик.
+    '''
+    try:
+        process_job(job)
+    except Exception as error:
+        try:
+            fail_job(job, error)
+        except Exception:
+            logger.exception('Не удалось сохранить ошибку задачи %s', job.pk)
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Обработка очереди картинок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.IMAGE_WORKERS,
+            help='Количество потоков обработки',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Завершить работу, когда очередь опустеет',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                jobs = ImageJob.objects.claim(
+                    workers * 2, settings.IMAGE_JOB_TIMEOUT
+                )
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(settings.IMAGE_JOB_POLL_INTERVAL)
+                    continue
+                results = list(pool.map(run_job, jobs))
+                self.stdout.write(
+                    f'Обработано картинок: {results.count(True)}, '
+                    f'ошибок: {results.count(False)}.'
+                )
+        self.stdout.write(self.style.SUCCESS('Очередь картинок обработана.'))
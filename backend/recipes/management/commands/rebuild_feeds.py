@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import backfill_feeds
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполнение лент подписок последними рецептами авторов '
+        'по всем подпискам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество подписок в одном пакете',
+        )
+
+    def handle(self, *args, **options):
+        subscriptions = Subscription.objects.order_by('pk')
+        last = 0
+        count = 0
+        while batch := list(
+            subscriptions.filter(pk__gt=last).values_list(
+                'pk', 'user', 'subscribing'
+            )[:options['batch_size']]
+        ):
+            backfill_feeds((user, author) for _, user, author in batch)
+            last = batch[-1][0]
+            count += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(f'Ленты заполнены по {count} подпискам.')
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from recipes.models import ShoppingCart, ShoppingListItem
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет итоговых списков покупок всех пользователей '
+        'по их корзинам покупок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Количество пользователей в одном пакете',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            Exists(ShoppingCart.objects.filter(user=OuterRef('pk')))
+            | Exists(ShoppingListItem.objects.filter(user=OuterRef('pk')))
+        ).order_by('pk')
+        last = 0
+        count = 0
+        while batch := list(
+            users.filter(pk__gt=last).values_list('pk', flat=True)[
+                :options['batch_size']
+            ]
+        ):
+            ShoppingListItem.objects.refresh(batch)
+            last = batch[-1]
+            count += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Списки покупок пересчитаны для {count} пользователей.'
+            )
+        )
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'subscribing'),
+)
+
+
+def count_related(model, field):
+    '''
+    Возвращает подзапрос количества объектов model,
+    ссылающихся полем field на текущую строку.
+    '''
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет счетчиков избранного рецептов, рецептов '
+        'и подписчиков пользователей'
+    )
+
+    def handle(self, *args, **kwargs):
+        for model, counter, related_model, field in COUNTERS:
+            actual = count_related(related_model, field)
+            fixed = (
+                model.objects.alias(actual=actual)
+                .exclude(**{counter: F('actual')})
+                .update(**{counter: actual})
+            )
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{counter}: '
+                f'исправлено {fixed}.'
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Счетчики пересчитаны успешно.')
+        )
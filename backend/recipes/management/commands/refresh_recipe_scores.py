@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe, RecipeScore
+from recipes.scores import refresh_scores
+from recipes.versions import recipe_score_version
+
+
+def iter_batches(queryset, size):
+    '''
+    Возвращает id объектов queryset пакетами по size в порядке id.
+    '''
+    last = None
+    while True:
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        batch = list(
+            queryset.order_by('pk').values_list('pk', flat=True)[:size]
+        )
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет рейтингов популярности рецептов, '
+        'по умолчанию только отмеченных к пересчету'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать рейтинги всех рецептов',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов в одном пакете',
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help=(
+                'Повторять пересчет каждые '
+                'RECIPE_SCORE_REFRESH_INTERVAL секунд'
+            ),
+        )
+
+    def refresh(self, full, batch_size):
+        started = time.monotonic()
+        if full:
+            queryset = Recipe.objects.all()
+        else:
+            queryset = RecipeScore.objects.filter(stale=True)
+        count = sum(
+            refresh_scores(batch)
+            for batch in iter_batches(queryset, batch_size)
+        )
+        if count:
+            recipe_score_version.bump()
+        self.stdout.write(
+            f'Пересчитано рейтингов: {count} '
+            f'за {time.monotonic() - started:.1f} с.'
+        )
+
+    def handle(self, *args, **options):
+        self.refresh(options['full'], options['batch_size'])
+        while options['watch']:
+            time.sleep(settings.RECIPE_SCORE_REFRESH_INTERVAL)
+            self.refresh(False, options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS('Рейтинги рецептов пересчитаны успешно.')
+        )
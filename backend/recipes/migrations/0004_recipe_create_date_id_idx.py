@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-create_date', '-id'], name='recipe_create_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def enqueue_images(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ImageJob = apps.get_model('recipes', 'ImageJob')
+    ImageJob.objects.bulk_create(
+        ImageJob(recipe_id=pk)
+        for pk in Recipe.objects.values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_update_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Уменьшенные копии картинки'),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Обработка картинки',
+                'verbose_name_plural': 'Очередь обработки картинок',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['status', 'id'], name='image_job_status_idx')],
+            },
+        ),
+        migrations.RunPython(enqueue_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    user_field = 'recipe__is_in_shopping_cart__user'
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        keep = row['keep']
+        merged = list(
+            Ingredient.objects.filter(
+                name=row['name'], measurement_unit=row['measurement_unit']
+            )
+            .exclude(pk=keep)
+            .values_list('pk', flat=True)
+        )
+        IngredientInRecipe.objects.filter(ingredient__in=merged).update(
+            ingredient=keep
+        )
+        ShoppingListItem.objects.filter(
+            ingredient__in=merged + [keep]
+        ).delete()
+        totals = (
+            IngredientInRecipe.objects.filter(
+                **{f'{user_field}__isnull': False}, ingredient=keep
+            )
+            .values(user_field)
+            .annotate(total=models.Sum('amount'))
+            .order_by()
+        )
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=total[user_field],
+                ingredient_id=keep,
+                amount=total['total'],
+            )
+            for total in totals
+        )
+        Ingredient.objects.filter(pk__in=merged).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:55
+
+from itertools import islice
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    scores = (
+        RecipeScore(recipe_id=pk, stale=True)
+        for pk in Recipe.objects.values_list('pk', flat=True).iterator()
+    )
+    while batch := list(islice(scores, 1000)):
+        RecipeScore.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popular', models.FloatField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Тренд')),
+                ('stale', models.BooleanField(default=False, verbose_name='Требует пересчета')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Пересчитан')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+                'indexes': [models.Index(fields=['-popular', '-recipe'], name='recipe_score_popular_idx'), models.Index(fields=['-trending', '-recipe'], name='recipe_score_trending_idx'), models.Index(condition=models.Q(('stale', True)), fields=['recipe'], name='recipe_score_stale_idx')],
+            },
+        ),
+        migrations.RunPython(create_scores, migrations.RunPython.noop),
+    ]
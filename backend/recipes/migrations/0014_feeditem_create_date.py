@@ -0,0 +1,37 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_create_date(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem.objects.update(
+        create_date=models.Subquery(
+            Recipe.objects.filter(pk=models.OuterRef('recipe')).values(
+                'create_date'
+            )
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_index_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feeditem',
+            name='create_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата публикации'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-create_date', '-recipe'], name='feed_item_user_date_idx'),
+        ),
+        migrations.RunPython(copy_create_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_fanned_out(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(
+        author__subscribers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).update(fanned_out=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_feeditem_create_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='fanned_out',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Разослан по лентам подписчиков'),
+        ),
+        migrations.RunPython(mark_fanned_out, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['author', '-create_date', '-id'], name='recipe_pulled_idx'),
+        ),
+    ]
@@ -1,9 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from recipes.storage import recipe_image_storage
 
 User = get_user_model()
 
+SEARCH_CONFIG = 'russian'
+
 
 class Tag(models.Model):
     '''
@@ -49,11 +61,98 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'], name='unique_ingredient'
+            )
+        ]
+        indexes = [
+            models.Index(
+                OpClass(Upper('name'), name='varchar_pattern_ops'),
+                name='ingredient_name_prefix_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
 
+def ingredients_prefetch():
+    '''
+    Возвращает подгрузку ингредиентов рецептов вместе с ингредиентами.
+    '''
+    return models.Prefetch(
+        'recipe_ingredients',
+        queryset=IngredientInRecipe.objects.select_related('ingredient'),
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    '''
+    QuerySet рецептов с подготовкой данных для сериализации.
+    '''
+
+    def with_related_data(self, user, ingredients=True):
+        '''
+        Подгружает автора и, если ingredients, ингредиенты рецептов
+        фиксированным числом запросов и аннотирует рецепты
+        списком id тегов tag_ids.
+        Поисковый вектор не нужен сериализаторам и не загружается.
+        '''
+        tag_ids = (
+            Recipe.tags.through.objects.filter(recipe=models.OuterRef('pk'))
+            .order_by('tag_id')
+            .values('tag_id')
+        )
+        queryset = (
+            self.defer('search_vector')
+            .annotate(tag_ids=ArraySubquery(tag_ids))
+            .prefetch_related(
+                models.Prefetch(
+                    'author', queryset=User.objects.with_is_subscribed(user)
+                )
+            )
+        )
+        if ingredients:
+            queryset = queryset.prefetch_related(ingredients_prefetch())
+        return queryset
+
+    def update_search_vector(self):
+        '''
+        Обновляет поисковый вектор рецептов по названию и описанию.
+        '''
+        return self.update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            )
+        )
+
+    def with_user_flags(self, user, ingredients=True):
+        '''
+        Аннотирует рецепты флагами наличия в избранном и корзине покупок
+        пользователя и подгружает связанные данные.
+        '''
+        queryset = self.with_related_data(user, ingredients)
+        if not user.is_authenticated:
+            return queryset.annotate(
+                favorited=models.Value(False),
+                in_shopping_cart=models.Value(False),
+            )
+        return queryset.annotate(
+            favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+
 class Recipe(models.Model):
     '''
     Модель для хранения рецептов.
@@ -75,11 +174,13 @@ class Recipe(models.Model):
         verbose_name='Автор',
         related_name='recipes',
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
     image = models.ImageField(
         verbose_name='Картинка, закодированная в Base64',
         upload_to='recipes/images/',
+        storage=recipe_image_storage,
         blank=False,
     )
 
@@ -97,14 +198,74 @@ class Recipe(models.Model):
         verbose_name='Дата публикации', auto_now_add=True
     )
 
+    update_date = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True
+    )
+
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор', null=True, editable=False
+    )
+
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавления в избранное', default=0, editable=False
+    )
+
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+
+    fanned_out = models.BooleanField(
+        verbose_name='Разослан по лентам подписчиков',
+        default=False,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ('-create_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-create_date', '-id'],
+                name='recipe_create_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-create_date', '-id'],
+                name='recipe_author_create_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-create_date', '-id'],
+                name='recipe_pulled_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+            GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'
+            ),
+            GinIndex(
+                fields=['name'],
+                name='recipe_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def is_same_image(self, content) -> bool:
+        '''
+        Проверяет, совпадает ли содержимое файла с картинкой рецепта.
+        '''
+        field = self._meta.get_field('image')
+        name = field.generate_filename(self, content.name)
+        return self.image.name == field.storage.get_content_name(
+            name, content
+        )
+
     def validate_ingredients(self) -> None:
         '''
         Валидирует количество ингридиентов.
@@ -120,6 +281,108 @@ class Recipe(models.Model):
         self.validate_ingredients()
 
 
+class ImageJobQuerySet(models.QuerySet):
+    '''
+    QuerySet очереди обработки картинок рецептов.
+    '''
+
+    def claim(self, limit, timeout):
+        '''
+        Забирает в обработку до limit задач из очереди, пропуская
+        заблокированные другими обработчиками, и возвращает их.
+        Задачи, зависшие в обработке дольше timeout секунд,
+        забираются повторно, а исчерпавшие IMAGE_JOB_MAX_ATTEMPTS
+        попыток помечаются ошибочными: обработка таких картинок
+        может завершать процесс обработчика.
+        '''
+        stale = timezone.now() - timedelta(seconds=timeout)
+        max_attempts = settings.IMAGE_JOB_MAX_ATTEMPTS
+        with transaction.atomic():
+            self.filter(
+                status=ImageJob.Status.PROCESSING,
+                updated__lt=stale,
+                attempts__gte=max_attempts,
+            ).update(
+                status=ImageJob.Status.FAILED,
+                error='Превышено время обработки.',
+                updated=timezone.now(),
+            )
+            jobs = list(
+                self.select_for_update(skip_locked=True, of=('self',))
+                .filter(
+                    models.Q(status=ImageJob.Status.PENDING)
+                    | models.Q(
+                        status=ImageJob.Status.PROCESSING,
+                        updated__lt=stale,
+                        attempts__lt=max_attempts,
+                    )
+                )
+                .select_related('recipe')
+                .order_by('id')[:limit]
+            )
+            self.filter(pk__in=[job.pk for job in jobs]).update(
+                status=ImageJob.Status.PROCESSING,
+                attempts=models.F('attempts') + 1,
+                updated=timezone.now(),
+            )
+        return jobs
+
+
+class ImageJob(models.Model):
+    '''
+    Модель для хранения очереди обработки картинок рецептов.
+    '''
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        PROCESSING = 'processing', 'Обрабатывается'
+        DONE = 'done', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='image_jobs',
+        on_delete=models.CASCADE,
+    )
+
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попытки', default=0
+    )
+
+    error = models.TextField(verbose_name='Ошибка', blank=True)
+
+    created = models.DateTimeField(
+        verbose_name='Дата создания', auto_now_add=True
+    )
+
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True
+    )
+
+    objects = ImageJobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Обработка картинки'
+        verbose_name_plural = 'Очередь обработки картинок'
+        indexes = [
+            models.Index(
+                fields=['status', 'id'], name='image_job_status_idx'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe.name}: {self.get_status_display()}'
+
+
 class IngredientInRecipe(models.Model):
     '''
     Модель для хранения связи между ингредиентами и рецептами.
@@ -164,7 +427,14 @@ class Favorite(models.Model):
     )
 
     user = models.ForeignKey(
-        User, verbose_name='Пользователь', on_delete=models.CASCADE
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+
+    created = models.DateTimeField(
+        verbose_name='Дата добавления', auto_now_add=True
     )
 
     class Meta:
@@ -173,7 +443,7 @@ class Favorite(models.Model):
         verbose_name_plural = 'Избранные'
         constraints = [
             models.UniqueConstraint(
-                fields=['recipe', 'user'], name='unique_favorite'
+                fields=['user', 'recipe'], name='unique_favorite'
             )
         ]
 
@@ -191,7 +461,14 @@ class ShoppingCart(models.Model):
     )
 
     user = models.ForeignKey(
-        User, verbose_name='Пользователь', on_delete=models.CASCADE
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+
+    created = models.DateTimeField(
+        verbose_name='Дата добавления', auto_now_add=True
     )
 
     class Meta:
@@ -200,7 +477,7 @@ class ShoppingCart(models.Model):
         verbose_name_plural = 'Списки покупок'
         constraints = [
             models.UniqueConstraint(
-                fields=['recipe', 'user'], name='unique_shopping_cart'
+                fields=['user', 'recipe'], name='unique_shopping_cart'
             )
         ]
 
@@ -208,3 +485,223 @@ class ShoppingCart(models.Model):
         return (
             f'{self.recipe.name} в списке покупок у ' f'{self.user.username}'
         )
+
+
+class FeedItem(models.Model):
+    '''
+    Модель для хранения ленты подписок пользователя: рецептов авторов,
+    на которых он подписан, разосланных при публикации.
+    Рецепты авторов с более чем FEED_FANOUT_LIMIT подписчиками
+    не рассылаются и читаются из их рецептов при запросе ленты.
+    Дата публикации рецепта копируется, чтобы страницы ленты
+    читались по индексу без обращения к рецептам.
+    '''
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+
+    recipe = models.ForeignKey(
+        Recipe, verbose_name='Рецепт', on_delete=models.CASCADE
+    )
+
+    create_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        default_related_name = 'feed_items'
+        verbose_name = 'Рецепт ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_item'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-create_date', '-recipe'],
+                name='feed_item_user_date_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id} в ленте {self.user_id}'
+
+
+class RecipeScore(models.Model):
+    '''
+    Модель для хранения рейтингов популярности рецептов.
+    popular - взвешенное количество добавлений в избранное и корзину
+    покупок за все время, trending - двоичный логарифм суммы
+    добавлений, затухающих с периодом полураспада
+    RECIPE_SCORE_HALF_LIFE, в периодах от RECIPE_SCORE_EPOCH.
+    Логарифмическая шкала позволяет не пересчитывать рейтинги
+    с течением времени: порядок рецептов сохраняется.
+    '''
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+    )
+
+    popular = models.FloatField(verbose_name='Популярность', default=0)
+
+    trending = models.FloatField(verbose_name='Тренд', default=0)
+
+    stale = models.BooleanField(
+        verbose_name='Требует пересчета', default=False
+    )
+
+    updated = models.DateTimeField(verbose_name='Пересчитан', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(
+                fields=['-popular', '-recipe'],
+                name='recipe_score_popular_idx',
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'],
+                name='recipe_score_trending_idx',
+            ),
+            models.Index(
+                fields=['recipe'],
+                name='recipe_score_stale_idx',
+                condition=models.Q(stale=True),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'Рейтинг {self.recipe_id}'
+
+
+class ShoppingListItemManager(models.Manager):
+    '''
+    Менеджер итоговых списков покупок.
+    '''
+
+    def refresh(self, user_ids, ingredient_ids=None):
+        '''
+        Пересчитывает итоговые количества переданных ингредиентов
+        (или всех, если они не переданы) в списках покупок
+        переданных пользователей.
+        Чтение корзин и запись итогов выполняются в одной транзакции
+        под блокировкой строк пользователей, поэтому одновременный
+        пересчет не может записать устаревшие итоги поверх новых.
+        '''
+        user_field = 'recipe__is_in_shopping_cart__user'
+        totals = IngredientInRecipe.objects.filter(
+            **{f'{user_field}__in': user_ids}
+        )
+        items = self.filter(user__in=user_ids)
+        if ingredient_ids is not None:
+            totals = totals.filter(ingredient__in=ingredient_ids)
+            items = items.filter(ingredient__in=ingredient_ids)
+        with transaction.atomic():
+            list(
+                User.objects.select_for_update()
+                .filter(pk__in=user_ids)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            amounts = sorted(
+                (row[user_field], row['ingredient'], row['total'])
+                for row in totals.values(user_field, 'ingredient')
+                .annotate(total=models.Sum('amount'))
+                .order_by()
+            )
+            kept = {
+                (user_id, ingredient_id)
+                for user_id, ingredient_id, _ in amounts
+            }
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for user_id, ingredient_id, amount in amounts
+                ],
+                update_conflicts=True,
+                unique_fields=['user', 'ingredient'],
+                update_fields=['amount'],
+            )
+            removed = [
+                pk
+                for pk, user_id, ingredient_id in items.values_list(
+                    'pk', 'user', 'ingredient'
+                )
+                if (user_id, ingredient_id) not in kept
+            ]
+            if removed:
+                self.filter(pk__in=removed).delete()
+
+    def refresh_for_recipe(self, recipe, user_ids=None, ingredient_ids=None):
+        '''
+        Пересчитывает списки покупок пользователей, у которых рецепт
+        находится в корзине, по ингредиентам рецепта.
+        '''
+        if user_ids is None:
+            user_ids = list(
+                ShoppingCart.objects.filter(recipe=recipe).values_list(
+                    'user', flat=True
+                )
+            )
+        if ingredient_ids is None:
+            ingredient_ids = list(
+                IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+                    'ingredient', flat=True
+                )
+            )
+        if user_ids and ingredient_ids:
+            self.refresh(user_ids, ingredient_ids)
+
+
+class ShoppingListItem(models.Model):
+    '''
+    Модель для хранения итогового списка покупок пользователя.
+    Пересчитывается при изменении корзины покупок и рецептов в ней.
+    '''
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингридиент',
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE,
+    )
+
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Итоговые списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            )
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'{self.ingredient.name} {self.amount} '
+            f'{self.ingredient.measurement_unit} у {self.user.username}'
+        )
@@ -0,0 +1,77 @@
+import datetime
+import math
+
+from django.conf import settings
+from django.db.models import Count, FloatField, Sum, Value
+from django.db.models.functions import Cast, Extract, Greatest, Power
+from django.utils import timezone
+
+from recipes.models import Favorite, RecipeScore, ShoppingCart
+
+SCORE_SOURCES = ((Favorite, 1), (ShoppingCart, 1))
+MIN_DECAY_EXPONENT = -1000.0
+
+
+def decayed_totals(model, recipe_ids, now):
+    '''
+    Возвращает для рецептов recipe_ids количество объектов model
+    и сумму их весов 2 ** (-возраст / RECIPE_SCORE_HALF_LIFE).
+    Показатель степени ограничен снизу, так как PostgreSQL
+    не допускает исчезновения порядка.
+    '''
+    created = Cast(
+        Extract('created', 'epoch', tzinfo=datetime.timezone.utc), FloatField()
+    )
+    exponent = Greatest(
+        (created - Value(now.timestamp()))
+        / Value(float(settings.RECIPE_SCORE_HALF_LIFE)),
+        Value(MIN_DECAY_EXPONENT),
+    )
+    return (
+        model.objects.filter(recipe__in=recipe_ids)
+        .order_by()
+        .values('recipe')
+        .annotate(total=Count('pk'), decayed=Sum(Power(Value(2.0), exponent)))
+    )
+
+
+def compute_scores(recipe_ids, now):
+    '''
+    Возвращает рейтинги рецептов recipe_ids на момент now.
+    '''
+    popular = dict.fromkeys(recipe_ids, 0)
+    decayed = dict.fromkeys(recipe_ids, 0)
+    for model, weight in SCORE_SOURCES:
+        for row in decayed_totals(model, recipe_ids, now):
+            popular[row['recipe']] += weight * row['total']
+            decayed[row['recipe']] += weight * row['decayed']
+    shift = (
+        now - settings.RECIPE_SCORE_EPOCH
+    ).total_seconds() / settings.RECIPE_SCORE_HALF_LIFE
+    return [
+        RecipeScore(
+            recipe_id=pk,
+            popular=popular[pk],
+            trending=math.log2(decayed[pk]) + shift if decayed[pk] else 0,
+        )
+        for pk in recipe_ids
+    ]
+
+
+def refresh_scores(recipe_ids):
+    '''
+    Пересчитывает и сохраняет рейтинги рецептов recipe_ids.
+    Отметка stale снимается до подсчета, поэтому добавления
+    в избранное и корзину во время пересчета отметят рецепт снова.
+    '''
+    now = timezone.now()
+    RecipeScore.objects.filter(pk__in=recipe_ids, stale=True).update(
+        stale=False
+    )
+    RecipeScore.objects.bulk_create(
+        compute_scores(recipe_ids, now),
+        update_conflicts=True,
+        unique_fields=['recipe'],
+        update_fields=['popular', 'trending', 'updated'],
+    )
+    return len(recipe_ids)
@@ -0,0 +1,250 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from recipes.catalogue import ingredient_catalogue, tag_catalogue
+from recipes.feed import backfill_feeds, fan_out_recipe, remove_from_feed
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            RecipeScore, ShoppingCart, ShoppingListItem, Tag)
+from recipes.versions import recipe_version, user_version
+from users.models import Subscription, User
+
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'email')
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Subscription: (User, 'subscribing_id', 'subscribers_count'),
+}
+
+
+def update_counter(sender, instance, delta):
+    '''
+    Атомарно изменяет на delta счетчик объекта, связанного с instance.
+    '''
+    model, field, counter = COUNTERS[sender]
+    model.objects.filter(pk=getattr(instance, field)).update(
+        **{counter: Greatest(F(counter) + delta, 0)}
+    )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_catalogue(**kwargs):
+    '''
+    Инвалидирует кэш ингредиентов при их изменении.
+    '''
+    transaction.on_commit(ingredient_catalogue.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_catalogue(**kwargs):
+    '''
+    Инвалидирует кэш тегов при их изменении.
+    '''
+    transaction.on_commit(tag_catalogue.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_version(**kwargs):
+    '''
+    Увеличивает версию рецептов при изменении рецепта,
+    его ингредиентов или тегов.
+    '''
+    transaction.on_commit(recipe_version.bump)
+
+
+@receiver(pre_save, sender=User)
+def check_author_fields(instance, raw=False, update_fields=None, **kwargs):
+    '''
+    Отмечает, изменились ли отображаемые в рецептах данные автора,
+    сравнивая их с сохраненными в базе.
+    '''
+    instance._author_changed = False
+    if raw or instance.pk is None:
+        return
+    if update_fields and set(update_fields).isdisjoint(AUTHOR_FIELDS):
+        return
+    stored = (
+        User.objects.filter(pk=instance.pk)
+        .values_list(*AUTHOR_FIELDS)
+        .first()
+    )
+    instance._author_changed = stored != tuple(
+        getattr(instance, field) for field in AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_recipe_version_on_user_change(instance, **kwargs):
+    '''
+    Увеличивает версию рецептов при изменении отображаемых
+    в рецептах данных автора.
+    '''
+    if getattr(instance, '_author_changed', False):
+        transaction.on_commit(recipe_version.bump)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def bump_user_version(instance, **kwargs):
+    '''
+    Увеличивает версию персональных данных пользователя.
+    '''
+    transaction.on_commit(user_version(instance.user_id).bump)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    '''
+    Обновляет поисковый вектор рецепта после его сохранения.
+    '''
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscription)
+def increment_counter(sender, instance, created, **kwargs):
+    '''
+    Увеличивает счетчик избранного рецепта, рецептов или подписчиков
+    автора при создании объекта.
+    '''
+    if created:
+        update_counter(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscription)
+def decrement_counter(sender, instance, **kwargs):
+    '''
+    Уменьшает счетчик избранного рецепта, рецептов или подписчиков
+    автора при удалении объекта.
+    '''
+    update_counter(sender, instance, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(instance, created, **kwargs):
+    '''
+    Создает нулевой рейтинг популярности нового рецепта.
+    '''
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def mark_recipe_score_stale(instance, **kwargs):
+    '''
+    Отмечает рейтинг рецепта к пересчету командой refresh_recipe_scores
+    при добавлении в избранное или корзину покупок и удалении из них.
+    '''
+    RecipeScore.objects.filter(pk=instance.recipe_id, stale=False).update(
+        stale=True
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(instance, created, **kwargs):
+    '''
+    Рассылает новый рецепт в ленты подписчиков автора
+    после фиксации транзакции.
+    '''
+    if created:
+        transaction.on_commit(
+            partial(
+                fan_out_recipe,
+                instance.pk,
+                instance.author_id,
+                instance.create_date,
+            )
+        )
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_subscription_feed(instance, created, **kwargs):
+    '''
+    Добавляет последние рецепты автора в ленту нового подписчика.
+    '''
+    if created:
+        backfill_feeds([(instance.user_id, instance.subscribing_id)])
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_subscription_feed(instance, **kwargs):
+    '''
+    Удаляет рецепты автора из ленты отписавшегося пользователя.
+    '''
+    remove_from_feed(instance.user_id, instance.subscribing_id)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def refresh_shopping_list_on_cart_change(instance, **kwargs):
+    '''
+    Пересчитывает список покупок пользователя по ингредиентам рецепта
+    при добавлении рецепта в корзину и удалении из нее.
+    '''
+    ShoppingListItem.objects.refresh_for_recipe(
+        instance.recipe_id, user_ids=[instance.user_id]
+    )
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_recipe_ingredient(instance, raw=False, **kwargs):
+    '''
+    Запоминает сохраненный в базе ингредиент строки рецепта,
+    чтобы при его замене пересчитать и прежний ингредиент.
+    '''
+    instance._stored_ingredient_id = (
+        None
+        if raw or instance.pk is None
+        else IngredientInRecipe.objects.filter(pk=instance.pk)
+        .values_list('ingredient', flat=True)
+        .first()
+    )
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def refresh_shopping_lists_on_ingredient_change(instance, **kwargs):
+    '''
+    Пересчитывает списки покупок пользователей, у которых рецепт
+    в корзине, при изменении и удалении ингредиента рецепта.
+    '''
+    ingredient_ids = {
+        instance.ingredient_id,
+        getattr(instance, '_stored_ingredient_id', None),
+    } - {None}
+    ShoppingListItem.objects.refresh_for_recipe(
+        instance.recipe_id, ingredient_ids=list(ingredient_ids)
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def refresh_shopping_lists_on_recipe_delete(instance, **kwargs):
+    '''
+    Пересчитывает списки покупок пользователей, у которых рецепт
+    был в корзине, после фиксации его удаления.
+    Корзины и ингредиенты удаляются каскадно вместе с рецептом,
+    поэтому они запоминаются до удаления.
+    '''
+    user_ids = list(
+        instance.is_in_shopping_cart.values_list('user', flat=True)
+    )
+    ingredient_ids = list(
+        instance.recipe_ingredients.values_list('ingredient', flat=True)
+    )
+    if user_ids and ingredient_ids:
+        transaction.on_commit(
+            partial(ShoppingListItem.objects.refresh, user_ids, ingredient_ids)
+        )
@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''
+    Файловое хранилище, сохраняющее файлы под именем из хэша
+    их содержимого.
+    Одинаковые файлы хранятся в одном экземпляре, а повторное
+    сохранение существующего файла только обновляет время его изменения.
+    Неиспользуемые файлы удаляет команда collect_media.
+    '''
+
+    def get_content_name(self, name, content):
+        '''
+        Возвращает имя файла из SHA-256 содержимого в каталоге name,
+        сохраняя расширение name.
+        '''
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        dirname, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(dirname, digest[:2], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        try:
+            # Обновление времени изменения защищает повторно
+            # использованный файл от удаления collect_media
+            # в течение MEDIA_GC_GRACE_PERIOD.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return self._save(name, content)
+        return name
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,51 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class CacheVersion:
+    '''
+    Версия данных в общем кэше Django.
+    При отсутствии ключа равна текущему времени в наносекундах,
+    чтобы после очистки кэша версии не повторялись.
+    Каждое изменение записывает новое уникальное значение.
+    '''
+
+    def __init__(self, name):
+        self.key = f'version:{name}'
+
+    @property
+    def cache(self):
+        return caches[settings.SHARED_CACHE_ALIAS]
+
+    def get(self):
+        '''
+        Возвращает текущую версию.
+        '''
+        version = self.cache.get(self.key)
+        if version is None:
+            self.cache.add(self.key, time.time_ns(), None)
+            version = self.cache.get(self.key)
+        return version
+
+    def bump(self):
+        '''
+        Заменяет версию новым уникальным значением.
+        incr файлового кэша и кэша в БД не атомарен, поэтому
+        при одновременных вызовах две смены версии дали бы одно значение.
+        '''
+        self.cache.set(self.key, uuid.uuid4().hex, None)
+
+
+recipe_version = CacheVersion('recipes')
+recipe_score_version = CacheVersion('recipe_scores')
+
+
+def user_version(user_id):
+    '''
+    Возвращает версию персональных данных пользователя:
+    избранного, корзины покупок и подписок.
+    '''
+    return CacheVersion(f'user:{user_id}')
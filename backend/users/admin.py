@@ -12,6 +12,8 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'role',
+        'recipes_count',
+        'subscribers_count',
     )
 
     list_editable = ('role',)
@@ -1,8 +1,51 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
 
+class UserQuerySet(models.QuerySet):
+    '''
+    QuerySet пользователей с аннотациями для сериализации.
+    '''
+
+    def with_is_subscribed(self, user):
+        '''
+        Аннотирует пользователей флагом подписки на них
+        переданного пользователя.
+        '''
+        if not user.is_authenticated:
+            return self.annotate(is_subscribed=models.Value(False))
+        return self.annotate(
+            is_subscribed=models.Exists(
+                Subscription.objects.filter(
+                    user=user, subscribing=models.OuterRef('pk')
+                )
+            )
+        )
+
+    def with_recipes(self, recipes_limit=None):
+        '''
+        Подгружает не более recipes_limit последних рецептов
+        каждого автора.
+        '''
+        recipe_model = self.model._meta.get_field('recipes').related_model
+        recipes = recipe_model.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        return self.prefetch_related(
+            models.Prefetch(
+                'recipes', queryset=recipes, to_attr='recipes_preview'
+            )
+        )
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    '''
+    Менеджер пользователей с методами UserQuerySet.
+    '''
+
+
 class User(AbstractUser):
     username_validator = UnicodeUsernameValidator
 
@@ -35,6 +78,16 @@ class User(AbstractUser):
 
     password = models.CharField(verbose_name="Пароль", max_length=150)
 
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов', default=0, editable=False
+    )
+
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков', default=0, editable=False
+    )
+
+    objects = UserManager()
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'Пользователь'
@@ -57,6 +110,7 @@ class Subscription(models.Model):
         on_delete=models.CASCADE,
         related_name='subscriber',
         verbose_name='Подписчик',
+        db_index=False,
     )
 
     subscribing = models.ForeignKey(
@@ -64,6 +118,7 @@ class Subscription(models.Model):
         on_delete=models.CASCADE,
         related_name='subscribing',
         verbose_name='Автор на которого подписан',
+        db_index=False,
     )
 
     class Meta:
@@ -72,6 +127,12 @@ class Subscription(models.Model):
                 fields=['user', 'subscribing'], name='unique_subscription'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['subscribing', 'user'],
+                name='subscription_subscribing_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user} подписан на {self.subscribing}'